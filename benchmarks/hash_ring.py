@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Check the slug distribution of the cluster hash ring: how evenly slugs spread
+over N nodes, and what fraction moves when a node is added or removed (ideally
+about 1/N).
+
+Needs no database. Usage: python -m benchmarks.hash_ring [--nodes 4] [--slugs 100000] [--vnodes 128]
+"""
+
+import argparse
+import statistics
+from collections import Counter
+from services.cluster import HashRing
+
+
+def moved_fraction(before: HashRing, after: HashRing, slugs) -> float:
+    return sum(1 for slug in slugs if before.owner(slug) != after.owner(slug)) / len(slugs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--slugs", type=int, default=100000)
+    parser.add_argument("--vnodes", type=int, default=128)
+    args = parser.parse_args()
+
+    slugs = [f"server-{i}" for i in range(args.slugs)]
+    nodes = [f"http://127.0.0.1:{8001 + i}" for i in range(args.nodes)]
+    ring = HashRing(nodes, args.vnodes)
+
+    load = Counter(ring.owner(slug) for slug in slugs)
+    shares = [load[node] / len(slugs) for node in nodes]
+    print(f"{args.nodes} nodes x {args.vnodes} virtual nodes, {args.slugs} slugs")
+    print(f"  share per node: min {min(shares):.3f}, max {max(shares):.3f}, stdev {statistics.pstdev(shares):.4f} (ideal {1 / args.nodes:.3f})")
+
+    grown = HashRing(nodes + [f"http://127.0.0.1:{8001 + args.nodes}"], args.vnodes)
+    print(f"  add a node:    {moved_fraction(ring, grown, slugs):.3f} of slugs moved (ideal {1 / (args.nodes + 1):.3f})")
+
+    shrunk = HashRing(nodes[:-1], args.vnodes)
+    print(f"  remove a node: {moved_fraction(ring, shrunk, slugs):.3f} of slugs moved (ideal {1 / args.nodes:.3f})")
+
+
+if __name__ == "__main__":
+    main()
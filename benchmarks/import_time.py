@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Import-time report for worker boot, suitable for CI.
+
+Imports the target in a fresh interpreter with ``-X importtime`` and prints the
+modules with the largest cumulative import time. With --budget-ms it exits
+non-zero when the target's total import time exceeds the budget.
+
+Usage:
+    python -m benchmarks.import_time                      # what `uvicorn main:app` pays at boot
+    python -m benchmarks.import_time --prewarm            # plus every lazily mounted router
+    python -m benchmarks.import_time --top 30 --budget-ms 400
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROUTER_MODULES = ["routes.auth", "routes.test", "routes.servers", "routes.chat", "routes.verify", "routes.metrics", "routes.admin"]
+
+
+def measure(modules):
+    """Return [(module, self_us, cumulative_us)] for one cold interpreter run."""
+    env = dict(os.environ)
+    # The DB pool connects lazily, so a placeholder is enough to import the app
+    env.setdefault("DATABASE_URL", "postgresql://localhost/import_time_report")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {m}" for m in modules)],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"Importing {', '.join(modules)} failed")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nesting is shown as extra indentation after the separator's single space
+        rows.append((name.rstrip()[1:], int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--prewarm", action="store_true", help="also import every router module")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    modules = [args.module] + (ROUTER_MODULES if args.prewarm else [])
+    rows = measure(modules)
+
+    # Only top-level rows for the requested modules; interpreter start-up imports are excluded
+    total_us = sum(cumulative for name, _, cumulative in rows if name in modules)
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name.strip()}")
+    print(f"\nTotal import time for {', '.join(modules)}: {total_us / 1000:.1f} ms")
+
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"Import time exceeds budget of {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
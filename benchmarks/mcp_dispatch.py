@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-request overhead on /servers/{slug}/mcp: rebuilding the
+FastMCP streamable HTTP app for every message (before) versus dispatching to
+the app cached on the LoadedServer (after).
+
+Drives the ASGI apps in-process with a tools/call request against a stateless
+echo server, so it needs no database or network (a placeholder DATABASE_URL is
+set for the import).
+Usage: python -m benchmarks.mcp_dispatch [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+
+# The DB pool connects lazily, so a placeholder is enough to import the manager
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/mcp_dispatch_benchmark")
+
+from mcp.server.fastmcp import FastMCP
+from services.mcp_manager import LoadedServer
+
+
+SERVER_SOURCE = '''
+bench_mcp = FastMCP(name="BenchServer", stateless_http=True, json_response=True)
+
+
+@bench_mcp.tool()
+def add(a: int, b: int) -> int:
+    """Add two numbers"""
+    return a + b
+'''
+
+BODY = json.dumps({
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "tools/call",
+    "params": {"name": "add", "arguments": {"a": 1, "b": 2}}
+}).encode()
+
+
+def make_scope():
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/mcp",
+        "raw_path": b"/mcp",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"accept", b"application/json, text/event-stream"),
+            (b"content-length", str(len(BODY)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+
+
+async def call(app) -> int:
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(make_scope(), receive, send)
+    return status
+
+
+async def run(name, get_app, total_requests):
+    latencies = []
+    for _ in range(total_requests):
+        started = time.perf_counter()
+        status = await call(get_app())
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert status == 200, f"{name}: unexpected status {status}"
+    latencies.sort()
+    print(
+        f"{name:>8}: mean {statistics.mean(latencies):.3f} ms, "
+        f"p50 {latencies[len(latencies) // 2]:.3f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.3f} ms"
+    )
+    return statistics.mean(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    exec_globals = {'FastMCP': FastMCP}
+    exec(SERVER_SOURCE, exec_globals)
+    # Set after FastMCP configures logging: per-request INFO lines, and the
+    # message router logging each stateless request's closed streams as an
+    # exception, would otherwise flood stderr
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    logging.getLogger("mcp.server.streamable_http").setLevel(logging.CRITICAL)
+    loaded = LoadedServer("bench", None, exec_globals['bench_mcp'])
+    await loaded.session.start()
+    try:
+        # Warm up both paths once so first-call imports are not measured
+        await call(loaded.mcp_server.streamable_http_app())
+        await call(loaded.app)
+
+        before = await run("before", loaded.mcp_server.streamable_http_app, args.requests)
+        after = await run("after", lambda: loaded.app, args.requests)
+        print(f"per-request overhead saved: {before - after:.3f} ms ({(1 - after / before) * 100:.1f}%)")
+    finally:
+        await loaded.session.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JSON-RPC instrumentation on the MCP proxy path, versus
+calling receive/send directly. Reports the per-message cost on the response
+path (passing the exchange through ExchangeTap) separately from the recording
+done once the response is out (method/tool extraction and the latency
+histograms). Covers a JSON response and an SSE stream, since the tap checks
+response bodies as they pass.
+
+Needs no database or MCP server. Usage: python -m benchmarks.mcp_instrumentation [--messages 50000]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from services.mcp_metrics import MCPMetrics
+from utils.asgi_tap import ExchangeTap
+
+
+REQUEST = json.dumps({
+    "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+    "params": {"name": "add", "arguments": {"a": 1, "b": 2}}
+}).encode()
+RESULT = json.dumps({
+    "jsonrpc": "2.0", "id": 1,
+    "result": {"content": [{"type": "text", "text": "3"}], "isError": False}
+}).encode()
+
+RESPONSES = {
+    "json": (b"application/json", [RESULT]),
+    "sse": (b"text/event-stream", [b"event: message\r\ndata: " + RESULT + b"\r\n\r\n"]),
+}
+
+
+async def exchange(receive, send, content_type, chunks):
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+    for index, chunk in enumerate(chunks):
+        await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+
+async def run(kind: str, messages: int, tapped: bool, recorded: bool) -> float:
+    content_type, chunks = RESPONSES[kind]
+    metrics = MCPMetrics()
+
+    async def receive():
+        return {"type": "http.request", "body": REQUEST, "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(messages):
+        if tapped:
+            tap = ExchangeTap(receive, send)
+            call_started = time.perf_counter()
+            await exchange(tap.receive, tap.send, content_type, chunks)
+            latency_ms = (time.perf_counter() - call_started) * 1000
+            if recorded:
+                metrics.observe("bench", tap.jsonrpc_calls(), tap.status, latency_ms, tap.rpc_errors, tap.tool_errors)
+        else:
+            await exchange(receive, send, content_type, chunks)
+    return (time.perf_counter() - started) / messages * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    for kind in RESPONSES:
+        await run(kind, 1000, True, True)
+        plain = await run(kind, args.messages, False, False)
+        tapped = await run(kind, args.messages, True, False)
+        recorded = await run(kind, args.messages, True, True)
+        print(
+            f"{kind:>5}: {plain:6.2f} us plain, +{tapped - plain:.2f} us on the response path, "
+            f"+{recorded - tapped:.2f} us recorded after it"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for /auth/nonce issuance: per-request time of the old
+SELECT-then-UPDATE/INSERT flow, the single upsert (NONCE_STORE=postgres) and
+the in-process TTL map (NONCE_STORE=memory).
+
+Runs against DATABASE_URL and removes the wallets it creates.
+Usage: python -m benchmarks.nonce_issuance [--requests 2000] [--concurrency 20] [--wallets 200]
+"""
+
+import argparse
+import asyncio
+import secrets
+import statistics
+import time
+from datetime import datetime
+from models.user import User
+from services.auth_service import auth_service
+from services.nonce_store import MemoryNonceStore
+from services.supabase_client import supabase_client
+from services.user_service import user_service
+
+
+async def legacy_issue_nonce(wallet_address: str, nonce: str):
+    """The pre-upsert flow: SELECT *, build a User, then UPDATE or INSERT."""
+    result = await supabase_client.execute_query(
+        "SELECT * FROM users WHERE wallet_address = %s", (wallet_address,)
+    )
+    if result:
+        User(**dict(result[0]))
+        await supabase_client.execute_query(
+            "UPDATE users SET nonce = %s, updated_at = %s WHERE wallet_address = %s",
+            (nonce, datetime.utcnow(), wallet_address)
+        )
+    else:
+        current_time = datetime.utcnow()
+        await supabase_client.execute_query("""
+            INSERT INTO users (wallet_address, display_name, nonce,
+                               created_at, updated_at, is_active, subscription_tier)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (wallet_address, f"User_{wallet_address[:8]}", nonce,
+              current_time, current_time, True, "free"))
+
+
+async def upsert_issue_nonce(wallet_address: str, nonce: str):
+    await user_service.upsert_user_nonce(wallet_address, nonce)
+
+
+async def run_load(name, issue, wallets, total_requests, concurrency):
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(wallets[i % len(wallets)])
+
+    async def worker():
+        while not queue.empty():
+            wallet_address = queue.get_nowait()
+            started = time.perf_counter()
+            await issue(wallet_address, auth_service.generate_nonce())
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{name:>8}: {total_requests / elapsed:8.1f} req/s | "
+          f"mean {statistics.mean(latencies):6.2f} ms | "
+          f"p50 {latencies[len(latencies) // 2]:6.2f} ms | "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--wallets", type=int, default=200)
+    args = parser.parse_args()
+
+    wallets = [f"0x{secrets.token_hex(20)}" for _ in range(args.wallets)]
+    print(f"{args.requests} nonce requests, concurrency {args.concurrency}, {args.wallets} wallets")
+
+    try:
+        # First pass inserts every wallet, the rest update existing rows
+        await run_load("before", legacy_issue_nonce, wallets, args.requests, args.concurrency)
+        await supabase_client.execute_query(
+            "DELETE FROM users WHERE wallet_address = ANY(%s)", (wallets,)
+        )
+        await run_load("after", upsert_issue_nonce, wallets, args.requests, args.concurrency)
+        await run_load("memory", MemoryNonceStore().issue, wallets, args.requests, args.concurrency)
+    finally:
+        await supabase_client.execute_query(
+            "DELETE FROM users WHERE wallet_address = ANY(%s)", (wallets,)
+        )
+        await supabase_client.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,6 +4,7 @@ Script to create MCP servers from test.py in the database
 Usage: python create_test_servers.py
 """
 
+import asyncio
 import uuid
 import json
 from datetime import datetime
@@ -54,7 +55,7 @@ def add_two(n: int) -> int:
     return n + 2
 '''
 
-def create_server(name, slug, description, source_code, category="utility"):
+async def create_server(name, slug, description, source_code, category="utility"):
     """Create a server in the database"""
     try:
         server_id = str(uuid.uuid4())
@@ -82,7 +83,7 @@ def create_server(name, slug, description, source_code, category="utility"):
             category
         )
         
-        supabase_client.execute_query(query, values)
+        await supabase_client.execute_query(query, values)
         print(f"✅ Created server: {name} (slug: {slug})")
         return server_id
         
@@ -90,7 +91,7 @@ def create_server(name, slug, description, source_code, category="utility"):
         print(f"❌ Error creating server {name}: {e}")
         return None
 
-def create_server_tools(server_id, tools):
+async def create_server_tools(server_id, tools):
     """Create tools for a server"""
     try:
         for tool in tools:
@@ -111,13 +112,13 @@ def create_server_tools(server_id, tools):
                 datetime.now()
             )
             
-            supabase_client.execute_query(query, values)
+            await supabase_client.execute_query(query, values)
             print(f"  ✅ Created tool: {tool['name']}")
             
     except Exception as e:
         print(f"❌ Error creating tools for server {server_id}: {e}")
 
-def main():
+async def main():
     """Main function to create test servers"""
     print("🚀 Creating MCP servers from test.py...")
     print(f"👤 User: {WALLET_ADDRESS}")
@@ -142,7 +143,7 @@ def main():
         }
     ]
     
-    echo_server_id = create_server(
+    echo_server_id = await create_server(
         name="Echo Server",
         slug="echo",
         description="A versatile MCP server with math tools, greeting resources, and prompt generation",
@@ -151,7 +152,7 @@ def main():
     )
     
     if echo_server_id:
-        create_server_tools(echo_server_id, echo_tools)
+        await create_server_tools(echo_server_id, echo_tools)
     
     print()
     
@@ -173,7 +174,7 @@ def main():
         }
     ]
     
-    math_server_id = create_server(
+    math_server_id = await create_server(
         name="Math Server",
         slug="math",
         description="Simple math operations MCP server with add_two functionality",
@@ -182,7 +183,7 @@ def main():
     )
     
     if math_server_id:
-        create_server_tools(math_server_id, math_tools)
+        await create_server_tools(math_server_id, math_tools)
     
     print()
     print("🎉 All servers created successfully!")
@@ -197,5 +198,7 @@ def main():
     print("  • GET /math/tools/list")
     print("  • POST /math/tools/call")
 
+    await supabase_client.close_connection()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
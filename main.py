@@ -1,21 +1,50 @@
+import contextlib
+import os
 from starlette.applications import Starlette
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.responses import JSONResponse
 from starlette.routing import Mount, Route
-from routes.auth import router as auth_router
-from routes.servers import router as servers_router
-from routes.chat import router as chat_router
-from routes.test import router as test_router, lifespan
-from routes.verify import router as verify_router
+from services.supabase_client import supabase_client
+from utils.auth_middleware import JWTAuthBackend
+from utils.lazy_router import LazyRouterRegistry
 import uvicorn
-from pprint import pprint
+
+
+# Import every router during startup instead of on its first request
+PREWARM_ROUTERS = os.getenv("PREWARM_ROUTERS", "false").lower() in ("1", "true", "yes")
+# Prewarming MCP servers, joining the cluster and starting the MCP worker processes run
+# in the servers router lifespan, so that router loads at startup when any is configured
+LOAD_SERVERS_ROUTER_AT_STARTUP = (
+    int(os.getenv("MCP_PREWARM_SERVERS", "0")) > 0
+    or bool(os.getenv("CLUSTER_NODES"))
+    or os.getenv("MCP_EXECUTION_MODE", "inline").lower() == "workers"
+)
+PORT = int(os.getenv("PORT", "8000"))
+
+lazy_routers = LazyRouterRegistry()
+servers_router = lazy_routers.mount("routes.servers:router", lifespan="lifespan")
 
 
 async def homepage(request):
     return JSONResponse({"message": "MCP Platform Backend API"})
 
 
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    lazy_routers.bind(app)
+    await supabase_client.open()
+    try:
+        if PREWARM_ROUTERS:
+            await lazy_routers.prewarm()
+        elif LOAD_SERVERS_ROUTER_AT_STARTUP:
+            await servers_router.load()
+        yield
+    finally:
+        await lazy_routers.shutdown()
+        await supabase_client.close_connection()
+
 
 middleware = [
     Middleware(
@@ -24,16 +53,19 @@ middleware = [
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-    )
+    ),
+    Middleware(AuthenticationMiddleware, backend=JWTAuthBackend())
 ]
-pprint(servers_router.routes)
 routes = [
     Route("/", homepage),
-    Mount("/auth", auth_router),
-    Mount("/test", test_router),
+    Mount("/auth", lazy_routers.mount("routes.auth:router", lifespan="lifespan")),
+    # The echo/math session managers start on the first /test request, or at boot with PREWARM_ROUTERS
+    Mount("/test", lazy_routers.mount("routes.test:router", lifespan="lifespan")),
     Mount("/servers", servers_router),
-    Mount("/chat", chat_router),
-    Mount("/verify", verify_router)
+    Mount("/chat", lazy_routers.mount("routes.chat:router")),
+    Mount("/verify", lazy_routers.mount("routes.verify:router")),
+    Mount("/metrics", lazy_routers.mount("routes.metrics:router")),
+    Mount("/admin", lazy_routers.mount("routes.admin:router"))
 ]
 
 app = Starlette(
@@ -44,4 +76,4 @@ app = Starlette(
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -4,13 +4,14 @@ Database migration script for CommandHive backend.
 Run this to create/update database tables.
 """
 
+import asyncio
 import os
 import sys
 from pathlib import Path
 from services.supabase_client import supabase_client
 
 
-def run_migration(migration_file: str):
+async def run_migration(migration_file: str):
     """Run a single migration file."""
     migration_path = Path(__file__).parent / "migrations" / migration_file
     
@@ -26,7 +27,7 @@ def run_migration(migration_file: str):
             sql_content = f.read()
         
         # Execute the migration
-        supabase_client.execute_query(sql_content)
+        await supabase_client.execute_query(sql_content)
         
         print(f"✅ Migration completed: {migration_file}")
         return True
@@ -37,7 +38,7 @@ def run_migration(migration_file: str):
         return False
 
 
-def run_all_migrations():
+async def run_all_migrations():
     """Run all migration files in order."""
     migrations_dir = Path(__file__).parent / "migrations"
     
@@ -57,7 +58,7 @@ def run_all_migrations():
     # Run each migration
     success_count = 0
     for migration_file in migration_files:
-        if run_migration(migration_file):
+        if await run_migration(migration_file):
             success_count += 1
         else:
             print(f"❌ Stopping due to failed migration: {migration_file}")
@@ -86,7 +87,7 @@ def main():
         sys.exit(1)
     
     # Run migrations
-    success = run_all_migrations()
+    success = asyncio.run(run_all_migrations())
     
     if success:
         print("\n🎯 Database is ready!")
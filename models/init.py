@@ -1,8 +1,8 @@
-import psycopg2
+import asyncio
 from services.supabase_client import supabase_client
 
 
-def create_tables():
+async def create_tables():
     """Create all PostgreSQL tables based on the defined models."""
     
     create_users_table = """
@@ -169,12 +169,20 @@ def create_tables():
     );
     """
     
+    create_cluster_nodes_table = """
+    CREATE TABLE IF NOT EXISTS cluster_nodes (
+        url TEXT PRIMARY KEY,
+        last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    
     create_indexes = """
     CREATE INDEX IF NOT EXISTS idx_servers_wallet_address ON servers(wallet_address);
     CREATE INDEX IF NOT EXISTS idx_servers_slug ON servers(slug);
     CREATE INDEX IF NOT EXISTS idx_servers_status ON servers(status);
     CREATE INDEX IF NOT EXISTS idx_servers_visibility ON servers(visibility);
     CREATE INDEX IF NOT EXISTS idx_servers_category ON servers(category);
+    CREATE INDEX IF NOT EXISTS idx_servers_last_accessed_at ON servers(last_accessed_at DESC NULLS LAST);
     CREATE INDEX IF NOT EXISTS idx_server_versions_server_id ON server_versions(server_id);
     CREATE INDEX IF NOT EXISTS idx_server_tools_server_id ON server_tools(server_id);
     CREATE INDEX IF NOT EXISTS idx_server_usage_logs_server_id ON server_usage_logs(server_id);
@@ -200,10 +208,15 @@ def create_tables():
         FOR EACH ROW
         EXECUTE FUNCTION update_updated_at_column();
 
+    -- The usage counters are bumped on every usage flush; updated_at only follows edits
     DROP TRIGGER IF EXISTS update_servers_updated_at ON servers;
     CREATE TRIGGER update_servers_updated_at
         BEFORE UPDATE ON servers
         FOR EACH ROW
+        WHEN (
+            to_jsonb(OLD) - 'total_requests' - 'last_accessed_at' - 'updated_at'
+            IS DISTINCT FROM to_jsonb(NEW) - 'total_requests' - 'last_accessed_at' - 'updated_at'
+        )
         EXECUTE FUNCTION update_updated_at_column();
 
     DROP TRIGGER IF EXISTS update_server_reviews_updated_at ON server_reviews;
@@ -232,13 +245,14 @@ def create_tables():
         create_deployment_logs_table,
         create_chat_sessions_table,
         create_chat_messages_table,
+        create_cluster_nodes_table,
         create_indexes,
         create_triggers
     ]
     
     try:
         for table_sql in tables:
-            supabase_client.execute_query(table_sql)
+            await supabase_client.execute_query(table_sql)
         print("All tables created successfully!")
         return True
     except Exception as e:
@@ -246,9 +260,10 @@ def create_tables():
         return False
 
 
-def drop_all_tables():
+async def drop_all_tables():
     """Drop all tables (use with caution)."""
     drop_tables_sql = """
+    DROP TABLE IF EXISTS cluster_nodes CASCADE;
     DROP TABLE IF EXISTS chat_messages CASCADE;
     DROP TABLE IF EXISTS chat_sessions CASCADE;
     DROP TABLE IF EXISTS deployment_logs CASCADE;
@@ -265,7 +280,7 @@ def drop_all_tables():
     """
     
     try:
-        supabase_client.execute_query(drop_tables_sql)
+        await supabase_client.execute_query(drop_tables_sql)
         print("All tables dropped successfully!")
         return True
     except Exception as e:
@@ -273,7 +288,7 @@ def drop_all_tables():
         return False
 
 
-def check_tables_exist():
+async def check_tables_exist():
     """Check if all required tables exist in the database."""
     check_query = """
     SELECT table_name 
@@ -283,14 +298,14 @@ def check_tables_exist():
     """
     
     try:
-        result = supabase_client.execute_query(check_query)
+        result = await supabase_client.execute_query(check_query)
         existing_tables = [row['table_name'] for row in result]
         
         required_tables = [
             'users', 'servers', 'server_versions', 'server_tools',
             'server_usage_logs', 'server_collections', 'collection_servers',
             'server_stars', 'server_reviews', 'deployment_logs',
-            'chat_sessions', 'chat_messages'
+            'chat_sessions', 'chat_messages', 'cluster_nodes'
         ]
         
         missing_tables = [table for table in required_tables if table not in existing_tables]
@@ -308,10 +323,15 @@ def check_tables_exist():
         return False
 
 
-if __name__ == "__main__":
+async def main():
     print("Checking if tables exist...")
-    if not check_tables_exist():
+    if not await check_tables_exist():
         print("Creating missing tables...")
-        create_tables()
+        await create_tables()
     else:
-        print("Database is already initialized!")
\ No newline at end of file
+        print("Database is already initialized!")
+    await supabase_client.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
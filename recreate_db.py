@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 
+import asyncio
 from models.init import drop_all_tables, create_tables
+from services.supabase_client import supabase_client
 
-if __name__ == "__main__":
+
+async def main():
     print("Dropping all existing tables...")
-    if drop_all_tables():
+    if await drop_all_tables():
         print("Creating new tables with updated schema...")
-        if create_tables():
+        if await create_tables():
             print("Database schema updated successfully!")
         else:
             print("Failed to create new tables!")
     else:
-        print("Failed to drop existing tables!")
\ No newline at end of file
+        print("Failed to drop existing tables!")
+    await supabase_client.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+from starlette.routing import Router, Route
+from starlette.responses import JSONResponse
+from services.mcp_manager import mcp_manager
+from services.mcp_workers import mcp_worker_pool
+from utils.auth_middleware import admin_required
+
+
+@admin_required
+async def memory_handler(request):
+    """Memory attributed to each loaded MCP server, largest first; ?sample=true re-measures first"""
+    try:
+        sample = request.query_params.get("sample") == "true"
+        if mcp_worker_pool.enabled:
+            return JSONResponse({
+                "status": "success",
+                "workers": await mcp_worker_pool.collect_memory(sample=sample)
+            })
+
+        if sample:
+            await mcp_manager.sample_memory()
+        return JSONResponse({
+            "status": "success",
+            "memory": mcp_manager.memory_report()
+        })
+
+    except Exception as e:
+        return JSONResponse({
+            "status": "error",
+            "message": str(e)
+        }, status_code=500)
+
+
+router = Router([
+    Route("/memory", memory_handler, methods=["GET"])
+])
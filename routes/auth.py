@@ -1,11 +1,14 @@
+import contextlib
 from starlette.routing import Route, Router
 from starlette.responses import JSONResponse
 from starlette.requests import Request
 from datetime import datetime
 from models.user import WalletAuthRequest, WalletVerifyRequest
 from services.auth_service import auth_service
-from services.crypto_service import crypto_service
+from services.crypto_service import crypto_service, signature_verifier
+from services.nonce_store import nonce_store
 from services.user_service import user_service
+from utils.auth_middleware import login_required
 
 
 async def request_nonce(request: Request):
@@ -24,10 +27,8 @@ async def request_nonce(request: Request):
         # Generate nonce
         nonce = auth_service.generate_nonce()
         
-        # Create or update user with nonce
-        user = await user_service.create_or_update_user_with_nonce(
-            wallet_request.wallet_address, nonce
-        )
+        # Park the nonce until it is consumed by /verify or expires
+        await nonce_store.issue(wallet_request.wallet_address, nonce)
         
         # Create message to sign
         message = auth_service.create_sign_message(nonce, wallet_request.wallet_address)
@@ -59,38 +60,32 @@ async def verify_wallet(request: Request):
                 status_code=400
             )
         
-        # Get user and validate nonce
-        user = await user_service.get_user_by_wallet(verify_request.wallet_address)
-        if not user or not user.nonce:
-            return JSONResponse(
-                {"success": False, "error": "Invalid or expired nonce"},
-                status_code=400
-            )
-        
-        # Check nonce match
-        if user.nonce != verify_request.nonce:
+        # Verify signature first: it needs no database access, and a bad
+        # signature must not burn the user's nonce
+        message = auth_service.create_sign_message(verify_request.nonce, verify_request.wallet_address)
+        if not await crypto_service.verify_signature_async(
+            message, verify_request.signature, verify_request.wallet_address
+        ):
             return JSONResponse(
-                {"success": False, "error": "Invalid nonce"},
+                {"success": False, "error": "Invalid signature"},
                 status_code=400
             )
         
-        
-        # Verify signature
-        message = auth_service.create_sign_message(verify_request.nonce, verify_request.wallet_address)
-        if not crypto_service.verify_signature(message, verify_request.signature, verify_request.wallet_address):
+        # Check and clear the nonce atomically so it cannot be replayed
+        user = await nonce_store.consume(
+            verify_request.wallet_address, verify_request.nonce
+        )
+        if not user:
             return JSONResponse(
-                {"success": False, "error": "Invalid signature"},
+                {"success": False, "error": "Invalid or expired nonce"},
                 status_code=400
             )
         
-        # Clear nonce after successful verification
-        await user_service.clear_user_nonce(verify_request.wallet_address)
-        
         # Generate JWT token
         token_data = {
-            "sub": user.wallet_address,
-            "wallet_address": user.wallet_address,
-            "display_name": user.display_name
+            "sub": user["wallet_address"],
+            "wallet_address": user["wallet_address"],
+            "display_name": user["display_name"]
         }
         access_token = auth_service.create_access_token(token_data)
         
@@ -100,10 +95,10 @@ async def verify_wallet(request: Request):
             "token_type": "bearer",
             "expires_in": auth_service.get_jwt_expiration_seconds(),
             "user": {
-                "wallet_address": user.wallet_address,
-                "display_name": user.display_name,
-                "subscription_tier": user.subscription_tier,
-                "is_active": user.is_active
+                "wallet_address": user["wallet_address"],
+                "display_name": user["display_name"],
+                "subscription_tier": user["subscription_tier"],
+                "is_active": user["is_active"]
             }
         })
         
@@ -115,35 +110,14 @@ async def verify_wallet(request: Request):
         )
 
 
+@login_required
 async def get_current_user(request: Request):
     """Get current authenticated user info."""
     try:
-        # Extract and validate token
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse(
-                {"success": False, "error": "Missing or invalid authorization header"},
-                status_code=401
-            )
-        
-        token = auth_header.split(" ")[1]
-        payload = auth_service.verify_token(token)
+        # Token was decoded once by the authentication middleware
+        wallet_address = request.user.wallet_address
         
-        if not payload:
-            return JSONResponse(
-                {"success": False, "error": "Invalid or expired token"},
-                status_code=401
-            )
-        
-        # Get wallet address from token
-        wallet_address = payload.get("sub")
-        if not wallet_address:
-            return JSONResponse(
-                {"success": False, "error": "Invalid token payload"},
-                status_code=401
-            )
-        
-        # Get user from database
+        # Get user (served from the user cache when fresh)
         user = await user_service.get_user_by_wallet(wallet_address)
         if not user:
             return JSONResponse(
@@ -204,6 +178,15 @@ async def auth_status(request: Request):
     })
 
 
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Stop the signature process pool when the app shuts down."""
+    try:
+        yield
+    finally:
+        signature_verifier.shutdown()
+
+
 router = Router(routes=[
     Route("/", auth_status, methods=["GET"]),
     Route("/nonce", request_nonce, methods=["POST"]),
@@ -0,0 +1,55 @@
+from starlette.routing import Router, Route
+from starlette.responses import JSONResponse
+from services.auth_service import token_cache
+from services.bulkhead import bulkheads
+from services.cluster import cluster
+from services.code_cache import code_cache
+from services.crypto_service import signature_verifier
+from services.mcp_manager import mcp_manager
+from services.mcp_metrics import mcp_metrics
+from services.mcp_workers import mcp_worker_pool
+from services.nonce_store import nonce_store
+from services.supabase_client import supabase_client
+from services.usage_logger import usage_logger
+from services.user_service import user_service
+from utils.auth_middleware import admin_required
+
+
+@admin_required
+async def metrics_handler(request):
+    """Runtime counters for the database layer, auth stores and MCP server caches"""
+    return JSONResponse({
+        "status": "success",
+        "database": supabase_client.stats(),
+        "nonce_store": nonce_store.stats(),
+        "user_cache": user_service.cache_stats(),
+        "token_cache": token_cache.stats(),
+        "signature_verifier": signature_verifier.stats(),
+        "code_cache": code_cache.stats(),
+        "mcp_servers": mcp_manager.stats(),
+        "mcp_calls": mcp_metrics.stats(),
+        "bulkheads": bulkheads.stats(),
+        "usage_logger": usage_logger.stats(),
+        "cluster": cluster.stats(),
+        "mcp_workers": await mcp_worker_pool.collect_stats() if mcp_worker_pool.enabled else mcp_worker_pool.stats()
+    })
+
+
+@admin_required
+async def mcp_series_handler(request):
+    """Latency histogram and error counts for every slug/method/tool series"""
+    series = await mcp_worker_pool.collect_mcp_series() if mcp_worker_pool.enabled else mcp_metrics.series()
+    slug = request.query_params.get("slug")
+    if slug:
+        series = [item for item in series if item["slug"] == slug]
+    return JSONResponse({
+        "status": "success",
+        "series": series,
+        "count": len(series)
+    })
+
+
+router = Router([
+    Route("/", metrics_handler, methods=["GET"]),
+    Route("/mcp", mcp_series_handler, methods=["GET"])
+])
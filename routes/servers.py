@@ -1,111 +1,97 @@
+import asyncio
 import contextlib
 import json
-from typing import Dict
-from starlette.routing import Router, Mount, Route
-from starlette.responses import JSONResponse, Response
-from starlette.applications import Starlette
-
-from mcp.server.fastmcp import FastMCP
-from services.server_db_service import ServerDatabaseService
+import time
+from starlette.routing import Router, Route
+from starlette.responses import JSONResponse
+
+from services.bulkhead import BulkheadRejected, bulkheads
+from services.cluster import cluster
+from services.http_proxy import client_ip
+from services.mcp_manager import MCP_PREWARM_SERVERS, mcp_manager
+from services.mcp_metrics import mcp_metrics
+from services.mcp_workers import mcp_worker_pool
+from services.server_db_service import ServerDatabaseService, SlugConflictError
 from services.server_service import ServerService
-
-
-class DynamicMCPManager:
-    def __init__(self):
-        self.active_servers: Dict[str, FastMCP] = {}
-        self.session_managers: Dict[str, contextlib.AsyncExitStack] = {}
-    
-    async def load_server_from_db(self, server_slug: str) -> FastMCP:
-        """Load an MCP server from database and execute its code"""
-        try:
-            # Get server configuration from database by slug
-            server_data = ServerDatabaseService.get_server_with_source_code(server_slug)
-            print(f"result from database query {server_data}")
-            
-            if not server_data:
-                raise ValueError(f"Server with slug '{server_slug}' not found or inactive")
-            
-            source_code = server_data.get('source_code')
-            print(f"source code to be executed {source_code}")
-            if not source_code:
-                raise ValueError(f"No source code found for server {server_slug}")
-            
-            # Execute the source code to create the MCP server
-            exec_globals = {'FastMCP': FastMCP}
-            exec(source_code, exec_globals)
-            
-            # Find the created MCP server instance
-            mcp_server = None
-            for var_name, var_value in exec_globals.items():
-                if isinstance(var_value, FastMCP):
-                    mcp_server = var_value
-                    break
-            
-            if not mcp_server:
-                raise ValueError(f"No FastMCP instance found in server {server_slug} source code")
-            
-            streamable_app = mcp_server.streamable_http_app()
-            # Start the session manager for this server
-            stack = contextlib.AsyncExitStack()
-            await stack.enter_async_context(mcp_server.session_manager.run())
-            self.session_managers[server_slug] = stack
-            
-            return mcp_server
-            
-        except Exception as e:
-            print(f"Error loading server {server_slug}: {e}")
-            raise
-    
-    async def get_or_create_server(self, server_slug: str) -> FastMCP:
-        """Get existing server or create new one from database"""
-        if server_slug not in self.active_servers:
-            self.active_servers[server_slug] = await self.load_server_from_db(server_slug)
-        return self.active_servers[server_slug]
-    
-    async def cleanup_server(self, server_slug: str):
-        """Cleanup server resources"""
-        if server_slug in self.session_managers:
-            await self.session_managers[server_slug].aclose()
-            del self.session_managers[server_slug]
-        
-        if server_slug in self.active_servers:
-            del self.active_servers[server_slug]
-
-
-# Global instance
-mcp_manager = DynamicMCPManager()
+from services.usage_logger import usage_logger
+from utils.asgi_tap import ExchangeTap
+
+
+class EmptyResponse:
+    """Returned once the streamable app has already sent the response."""
+    async def __call__(self, scope, receive, send):
+        pass
+
+
+def record_exchange(request, server_slug: str, server_id, tap: ExchangeTap, latency_ms: float, error: str = None):
+    """Feed one MCP exchange to the latency metrics and the batched usage log."""
+    calls = tap.jsonrpc_calls()
+    status = tap.status or (500 if error else None)
+    mcp_metrics.observe(server_slug, calls, status, latency_ms, tap.rpc_errors, tap.tool_errors)
+    user = request.scope.get("user")
+    usage_logger.record(
+        server_id,
+        tool_name=next((call["tool"] for call in calls if call["tool"]), None),
+        request_data={"methods": [call["method"] for call in calls]} if calls else None,
+        status=status,
+        latency_ms=latency_ms,
+        client_identifier=getattr(user, "wallet_address", None),
+        ip_address=client_ip(request),
+        user_agent=request.headers.get("user-agent"),
+        error_message=error
+    )
 
 
 async def dynamic_mcp_handler(request):
     """Handle dynamic MCP server requests"""
-    print(request)
     try:
         server_slug = request.path_params.get('slug')
         server_slug = server_slug.replace("/mcp", "")
-        # Get or create the MCP server
-        mcp_server = await mcp_manager.get_or_create_server(server_slug)
-        
-        # Forward the request to the MCP server's streamable HTTP app
-        streamable_app = mcp_server.streamable_http_app()
-        
-        # Create a new request with the path stripped of the slug prefix
-        path_info = request.url.path.replace(f'/{server_slug}', '') or '/'
-        
-        # Create a modified scope for the streamable app
-        scope = dict(request.scope)
-        scope['path'] = path_info
-        scope['path_info'] = path_info
-        
-        # Call the streamable app directly (it handles sending the response)
-        await streamable_app(scope, request.receive, request._send)
+        if cluster.should_forward(request, server_slug):
+            # Another node owns this slug on the hash ring; it keeps the server loaded
+            return await cluster.forward(request, server_slug)
+        if mcp_worker_pool.enabled:
+            # The owning worker process runs the server; stream the exchange through
+            return await mcp_worker_pool.proxy(request, server_slug)
+        
+        # Get or create the MCP server; it stays pinned against eviction until the response is sent
+        async with mcp_manager.use_server(server_slug, request.headers.get("mcp-session-id")) as loaded:
+            # Per-server in-flight limit, so one slow server cannot take every request slot.
+            # A GET is the session's long-lived SSE stream; it would hold a slot until the client leaves
+            admission = contextlib.nullcontext() if request.method == "GET" else bulkheads.admit(server_slug, loaded.tier)
+            async with admission:
+                # Create a new request with the path stripped of the slug prefix
+                path_info = request.url.path.replace(f'/{server_slug}', '') or '/'
+                
+                # Create a modified scope for the streamable app
+                scope = dict(request.scope)
+                scope['path'] = path_info
+                scope['path_info'] = path_info
+                
+                # Forward to the server's cached streamable HTTP app (it handles sending the response)
+                tap = ExchangeTap(request.receive, request._send)
+                started = time.perf_counter()
+                error = None
+                try:
+                    await loaded.app(scope, tap.receive, tap.send)
+                except Exception as e:
+                    error = str(e)
+                    raise
+                finally:
+                    # The response is out; parsing and recording run after this handler returns
+                    asyncio.get_running_loop().call_soon(
+                        record_exchange, request, server_slug, loaded.server_id, tap,
+                        (time.perf_counter() - started) * 1000, error
+                    )
         
         # Return an empty response since streamable app already handled the response
-        class EmptyResponse:
-            async def __call__(self, scope, receive, send):
-                pass
-        
         return EmptyResponse()
         
+    except BulkheadRejected as e:
+        return JSONResponse({
+            "status": "error",
+            "message": str(e)
+        }, status_code=e.status_code, headers={"Retry-After": e.retry_after_header})
     except Exception as e:
         return JSONResponse({
             "status": "error",
@@ -116,7 +102,7 @@ async def dynamic_mcp_handler(request):
 async def list_servers_handler(request):
     """List all active servers"""
     try:
-        servers = ServerDatabaseService.list_active_servers()
+        servers = await ServerDatabaseService.list_active_servers()
         
         return JSONResponse({
             "status": "success",
@@ -137,7 +123,11 @@ async def get_server_info_handler(request):
     """Get server information by slug"""
     try:
         server_slug = request.path_params.get('slug')
-        server_data = ServerDatabaseService.get_server_by_slug(server_slug)
+        # Keeps a creator's lookup of their new server off lagging replicas
+        wallet_address = getattr(request.scope.get("user"), "wallet_address", None)
+        server_data = await ServerDatabaseService.get_server_by_slug(
+            server_slug, sticky_key=wallet_address.lower() if wallet_address else None
+        )
         
         if not server_data:
             return JSONResponse({
@@ -163,7 +153,7 @@ async def create_mcp_server_handler(request):
         body = await request.json()
         
         # Use the server service to create the server
-        server_data = ServerService.create_server(body)
+        server_data = await ServerService.create_server(body)
         
         return JSONResponse({
             "status": "success",
@@ -171,6 +161,11 @@ async def create_mcp_server_handler(request):
             "server": server_data
         }, status_code=201)
         
+    except SlugConflictError as e:
+        return JSONResponse({
+            "status": "error",
+            "message": str(e)
+        }, status_code=409)
     except ValueError as e:
         # Validation errors
         return JSONResponse({
@@ -189,6 +184,25 @@ async def create_mcp_server_handler(request):
         }, status_code=500)
 
 
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Join the cluster, start the MCP worker processes or prewarm popular servers; close every loaded server on shutdown."""
+    await cluster.start()
+    if mcp_worker_pool.enabled:
+        # Each worker prewarms its own share of the popular servers before reporting ready
+        await mcp_worker_pool.start()
+    elif MCP_PREWARM_SERVERS > 0:
+        await mcp_manager.prewarm(owns=cluster.owns)
+    try:
+        yield
+    finally:
+        if mcp_worker_pool.enabled:
+            await mcp_worker_pool.shutdown()
+        await mcp_manager.shutdown()
+        await usage_logger.shutdown()
+        await cluster.shutdown()
+
+
 router = Router([
     Route("/", list_servers_handler, methods=["GET"]),
     Route("/create", create_mcp_server_handler, methods=["POST"]),
@@ -5,6 +5,8 @@ from typing import Dict, Any, List, Tuple
 from starlette.routing import Router, Route
 from starlette.responses import JSONResponse
 from mcp.server.fastmcp import FastMCP
+from services.code_cache import code_cache
+from services.tool_cache import cacheable
 
 
 class MCPCodeValidator:
@@ -65,7 +67,8 @@ class MCPCodeValidator:
             "has_prompts": False,
             "tool_functions": [],
             "resource_functions": [],
-            "prompt_functions": []
+            "prompt_functions": [],
+            "cacheable_functions": []
         }
         
         try:
@@ -100,6 +103,10 @@ class MCPCodeValidator:
                             decorator_name = decorator.attr
                         elif isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute):
                             decorator_name = decorator.func.attr
+                        elif isinstance(decorator, ast.Name) and decorator.id == "cacheable":
+                            decorator_name = "cacheable"
+                        elif isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name) and decorator.func.id == "cacheable":
+                            decorator_name = "cacheable"
                         
                         if decorator_name == "tool":
                             result["has_tools"] = True
@@ -110,6 +117,8 @@ class MCPCodeValidator:
                         elif decorator_name == "prompt":
                             result["has_prompts"] = True
                             result["prompt_functions"].append(node.name)
+                        elif decorator_name == "cacheable":
+                            result["cacheable_functions"].append(node.name)
         
         except Exception:
             pass
@@ -121,10 +130,10 @@ class MCPCodeValidator:
         """Safely test if code can be executed and creates valid MCP instance"""
         try:
             # Create safe execution environment
-            safe_globals = {'FastMCP': FastMCP}
+            safe_globals = {'FastMCP': FastMCP, 'cacheable': cacheable}
             
-            # Execute the code
-            exec(source_code, safe_globals)
+            # Execute the code; reuses a server's cached compile but never adds to the cache
+            exec(code_cache.get_code(source_code, store=False), safe_globals)
             
             # Look for FastMCP instance
             mcp_instance = None
@@ -1,14 +1,22 @@
+import hashlib
 import os
 import secrets
+import time
 from datetime import datetime
 from typing import Optional
 from jose import JWTError, jwt
+from utils.cache import TTLCache
 
 
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-this")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 NONCE_EXPIRATION_MINUTES = 5
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+# sha256(token) -> decoded payload of a token that already passed verification;
+# each entry expires at the token's own exp
+token_cache = TTLCache(TOKEN_CACHE_MAX_ENTRIES, JWT_EXPIRATION_HOURS * 3600)
 
 
 class AuthService:
@@ -25,12 +33,23 @@ class AuthService:
 
     @staticmethod
     def verify_token(token: str) -> Optional[dict]:
-        """Verify and decode a JWT token."""
+        """Verify and decode a JWT token, skipping the decode for recently verified tokens."""
+        digest = hashlib.sha256(token.encode()).digest()
+        payload = token_cache.get(digest)
+        if payload is not None:
+            return dict(payload)
+        
         try:
             payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-            return payload
         except JWTError:
             return None
+        
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            remaining = exp - time.time()
+            if remaining > 0:
+                token_cache.set(digest, payload, ttl=remaining)
+        return dict(payload)
 
     @staticmethod
     def generate_nonce() -> str:
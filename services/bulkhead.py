@@ -0,0 +1,150 @@
+import asyncio
+import contextlib
+import json
+import math
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+# Per subscription_tier limits for one server: concurrent requests and how many may wait
+DEFAULT_TIER_LIMITS = {
+    "free": {"concurrency": 4, "queue": 16},
+    "pro": {"concurrency": 16, "queue": 64},
+    "enterprise": {"concurrency": 64, "queue": 256},
+}
+MCP_TIER_LIMITS = {**DEFAULT_TIER_LIMITS, **json.loads(os.getenv("MCP_TIER_LIMITS") or "{}")}
+# Tier used when the owner's tier is unknown or has no entry above
+MCP_DEFAULT_TIER = os.getenv("MCP_DEFAULT_TIER", "free")
+# Longest a queued request waits for a slot before a 503
+MCP_BULKHEAD_QUEUE_TIMEOUT = float(os.getenv("MCP_BULKHEAD_QUEUE_TIMEOUT", "10"))
+# Retry-After sent with 429/503 rejections
+MCP_BULKHEAD_RETRY_AFTER = float(os.getenv("MCP_BULKHEAD_RETRY_AFTER", "1"))
+
+
+class BulkheadRejected(Exception):
+    """Raised when a request is turned away instead of queued or after waiting too long."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class Bulkhead:
+    """In-flight limit for one server with a bounded wait queue."""
+
+    def __init__(self, tier: str, concurrency: int, queue_size: int):
+        self.tier = tier
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and self.waiting == 0
+
+    @property
+    def saturated(self) -> bool:
+        return self._semaphore.locked()
+
+    async def acquire(self, timeout: float):
+        if self.saturated:
+            if self.waiting >= self.queue_size:
+                raise BulkheadRejected("Server is at capacity, retry later", 429, MCP_BULKHEAD_RETRY_AFTER)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise BulkheadRejected("Timed out waiting for server capacity", 503, MCP_BULKHEAD_RETRY_AFTER)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+
+class BulkheadRegistry:
+    """Per-slug bulkheads sized by the owner's subscription tier.
+
+    A bulkhead exists only while its server has requests running or queued,
+    so the map stays as small as the set of busy servers.
+    """
+
+    def __init__(self, tier_limits: Dict[str, Dict[str, int]] = MCP_TIER_LIMITS, timeout: float = MCP_BULKHEAD_QUEUE_TIMEOUT):
+        self.tier_limits = tier_limits
+        self.timeout = timeout
+        self._bulkheads: Dict[str, Bulkhead] = {}
+        self.admitted = 0
+        self.queued = 0
+        self.rejections: Dict[str, int] = {"queue_full": 0, "timeout": 0}
+        self.rejections_by_tier: Dict[str, int] = {}
+
+    def _limits(self, tier: Optional[str]):
+        tier = tier if tier in self.tier_limits else MCP_DEFAULT_TIER
+        limits = self.tier_limits.get(tier) or DEFAULT_TIER_LIMITS["free"]
+        return tier, limits
+
+    @contextlib.asynccontextmanager
+    async def admit(self, server_slug: str, tier: Optional[str]) -> AsyncIterator[Bulkhead]:
+        """Hold one of the server's slots for the body; raises BulkheadRejected."""
+        bulkhead = self._bulkheads.get(server_slug)
+        if bulkhead is None:
+            tier, limits = self._limits(tier)
+            bulkhead = Bulkhead(tier, limits["concurrency"], limits["queue"])
+            self._bulkheads[server_slug] = bulkhead
+
+        if bulkhead.saturated and bulkhead.waiting < bulkhead.queue_size:
+            self.queued += 1
+        try:
+            await bulkhead.acquire(self.timeout)
+        except BulkheadRejected as e:
+            self.rejections["queue_full" if e.status_code == 429 else "timeout"] += 1
+            self.rejections_by_tier[bulkhead.tier] = self.rejections_by_tier.get(bulkhead.tier, 0) + 1
+            self._discard_if_idle(server_slug, bulkhead)
+            raise
+        except BaseException:
+            self._discard_if_idle(server_slug, bulkhead)
+            raise
+
+        self.admitted += 1
+        try:
+            yield bulkhead
+        finally:
+            bulkhead.release()
+            self._discard_if_idle(server_slug, bulkhead)
+
+    def _discard_if_idle(self, server_slug: str, bulkhead: Bulkhead):
+        if bulkhead.idle and self._bulkheads.get(server_slug) is bulkhead:
+            del self._bulkheads[server_slug]
+
+    def stats(self) -> Dict[str, Any]:
+        busiest = sorted(self._bulkheads.items(), key=lambda item: (item[1].waiting, item[1].active), reverse=True)[:10]
+        return {
+            "tier_limits": self.tier_limits,
+            "queue_timeout_seconds": self.timeout,
+            "busy_servers": len(self._bulkheads),
+            "active": sum(bulkhead.active for bulkhead in self._bulkheads.values()),
+            "queue_depth": sum(bulkhead.waiting for bulkhead in self._bulkheads.values()),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejections": dict(self.rejections),
+            "rejections_by_tier": dict(self.rejections_by_tier),
+            "busiest": {
+                slug: {"tier": bulkhead.tier, "active": bulkhead.active, "waiting": bulkhead.waiting}
+                for slug, bulkhead in busiest
+            }
+        }
+
+
+# Global instance
+bulkheads = BulkheadRegistry()
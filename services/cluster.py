@@ -0,0 +1,222 @@
+"""
+Consistent-hash sharding of tenant MCP servers across backend nodes.
+
+Each slug is owned by one node, picked on a hash ring with CLUSTER_VIRTUAL_NODES
+points per node, so adding or removing a node moves only about 1/N of the
+slugs. Requests for a slug owned elsewhere are forwarded to the owner.
+
+The node list is either static (CLUSTER_NODES) or, with CLUSTER_NODES=db, the
+cluster_nodes table: every node upserts a heartbeat and the ring is rebuilt
+from the nodes seen within CLUSTER_NODE_TTL_SECONDS.
+
+A forwarded request is only served in place when it comes from a ring node
+(matched by the node URLs' hosts and the addresses they resolve to) or, in a
+worker process, relayed by its own API process; anyone else sending the
+forwarding header gets normal ring placement.
+
+Local example with two nodes:
+    CLUSTER_NODES=http://127.0.0.1:8001,http://127.0.0.1:8002 CLUSTER_SELF=http://127.0.0.1:8001 PORT=8001 python main.py
+    CLUSTER_NODES=http://127.0.0.1:8001,http://127.0.0.1:8002 CLUSTER_SELF=http://127.0.0.1:8002 PORT=8002 python main.py
+"""
+
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import os
+import socket
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services.http_proxy import PROXY_TIMEOUT, from_api_process, proxy_request
+from services.supabase_client import supabase_client
+
+
+# Comma-separated node base URLs, or "db" to use the cluster_nodes table; empty disables clustering
+CLUSTER_NODES = os.getenv("CLUSTER_NODES", "")
+# This node's base URL as the other nodes reach it
+CLUSTER_SELF = os.getenv("CLUSTER_SELF", "").rstrip("/")
+CLUSTER_VIRTUAL_NODES = int(os.getenv("CLUSTER_VIRTUAL_NODES", "128"))
+CLUSTER_REFRESH_INTERVAL = float(os.getenv("CLUSTER_REFRESH_INTERVAL", "10"))
+CLUSTER_NODE_TTL_SECONDS = float(os.getenv("CLUSTER_NODE_TTL_SECONDS", "30"))
+
+# Set on forwarded requests; the receiving node serves them locally instead of forwarding again
+FORWARDED_HEADER = "x-mcp-forwarded-by"
+
+UPSERT_NODE_HEARTBEAT = """
+    INSERT INTO cluster_nodes (url, last_seen_at)
+    VALUES (%s, NOW())
+    ON CONFLICT (url) DO UPDATE SET last_seen_at = NOW()
+"""
+LIVE_NODES = """
+    SELECT url FROM cluster_nodes
+    WHERE last_seen_at > NOW() - make_interval(secs => %s)
+"""
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def _node_hosts(nodes: Iterable[str], resolve: bool = False) -> Set[str]:
+    """Hosts of the node URLs and, with ``resolve``, every address they resolve to (blocking)."""
+    hosts = set()
+    for node in nodes:
+        host = urlsplit(node).hostname
+        if not host:
+            continue
+        hosts.add(host)
+        if resolve:
+            with contextlib.suppress(OSError):
+                hosts.update(info[4][0] for info in socket.getaddrinfo(host, None))
+    return hosts
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = CLUSTER_VIRTUAL_NODES):
+        self.nodes = sorted(set(nodes))
+        self.vnodes = vnodes
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class Cluster:
+    """This node's view of the ring and the forwarding client to its peers."""
+
+    def __init__(self, nodes: str = CLUSTER_NODES, self_url: str = CLUSTER_SELF):
+        self.self_url = self_url
+        self.from_db = nodes.strip().lower() == "db"
+        static_nodes = [] if self.from_db else [node.strip().rstrip("/") for node in nodes.split(",") if node.strip()]
+        self.ring = HashRing(static_nodes)
+        self._peer_hosts = _node_hosts(static_nodes)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.forwarded = 0
+        self.received = 0
+        self.untrusted_forwards = 0
+        self.ring_changes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.self_url) and (self.from_db or bool(self.ring.nodes))
+
+    def owner(self, server_slug: str) -> Optional[str]:
+        return self.ring.owner(server_slug)
+
+    def owns(self, server_slug: str) -> bool:
+        """Whether this node serves the slug; true when clustering is off or the ring is empty."""
+        if not self.enabled:
+            return True
+        owner = self.ring.owner(server_slug)
+        return owner is None or owner == self.self_url
+
+    def should_forward(self, request: Request, server_slug: str) -> bool:
+        if not self.enabled:
+            return False
+        if FORWARDED_HEADER in request.headers:
+            if self.is_peer(request):
+                # Already forwarded once; serve it here even if our ring disagrees
+                self.received += 1
+                return False
+            self.untrusted_forwards += 1
+        return not self.owns(server_slug)
+
+    def is_peer(self, request: Request) -> bool:
+        """Whether the request comes straight from another ring node."""
+        if from_api_process(request):
+            # Our API process relaying to this worker; it already checked the hop it received
+            return True
+        return request.client is not None and request.client.host in self._peer_hosts
+
+    async def _resolve_peers(self):
+        nodes = self.ring.nodes
+        hosts = await asyncio.get_running_loop().run_in_executor(None, _node_hosts, nodes, True)
+        if nodes == self.ring.nodes:
+            self._peer_hosts = hosts
+
+    async def forward(self, request: Request, server_slug: str) -> Response:
+        owner = self.ring.owner(server_slug)
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=PROXY_TIMEOUT)
+        self.forwarded += 1
+        url = f"{owner}{request.url.path}"
+        if request.url.query:
+            url += f"?{request.url.query}"
+        return await proxy_request(
+            self._client, request, url,
+            extra_headers=[(FORWARDED_HEADER.encode(), self.self_url.encode())]
+        )
+
+    def _set_nodes(self, nodes: List[str]):
+        nodes = sorted(set(nodes) | {self.self_url})
+        if nodes != self.ring.nodes:
+            self.ring = HashRing(nodes, self.ring.vnodes)
+            self._peer_hosts = _node_hosts(nodes)
+            self.ring_changes += 1
+            print(f"Cluster ring now has {len(nodes)} nodes: {nodes}")
+
+    async def refresh(self):
+        """Heartbeat this node and rebuild the ring from the live nodes."""
+        await supabase_client.execute_query(UPSERT_NODE_HEARTBEAT, (self.self_url,))
+        rows = await supabase_client.execute_query(LIVE_NODES, (CLUSTER_NODE_TTL_SECONDS,))
+        self._set_nodes([row["url"].rstrip("/") for row in rows or []])
+        await self._resolve_peers()
+
+    async def _refresh_forever(self):
+        while True:
+            await asyncio.sleep(CLUSTER_REFRESH_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Cluster refresh failed: {e}")
+
+    async def start(self):
+        if not self.enabled:
+            return
+        if not self.from_db:
+            await self._resolve_peers()
+            return
+        await self.refresh()
+        self._refresher = asyncio.get_running_loop().create_task(self._refresh_forever())
+
+    async def shutdown(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresher
+            self._refresher = None
+            # Leave the ring right away instead of waiting for the TTL
+            with contextlib.suppress(Exception):
+                await supabase_client.execute_query("DELETE FROM cluster_nodes WHERE url = %s", (self.self_url,))
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "self": self.self_url or None,
+            "nodes": self.ring.nodes,
+            "virtual_nodes": self.ring.vnodes,
+            "forwarded": self.forwarded,
+            "received": self.received,
+            "untrusted_forwards": self.untrusted_forwards,
+            "ring_changes": self.ring_changes
+        }
+
+
+# Global instance
+cluster = Cluster()
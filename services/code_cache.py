@@ -0,0 +1,154 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+import struct
+import time
+from pathlib import Path
+from types import CodeType
+from typing import Any, Dict, Optional
+from utils.cache import TTLCache
+
+
+MCP_CODE_CACHE_MAX_ENTRIES = int(os.getenv("MCP_CODE_CACHE_MAX_ENTRIES", "512"))
+# Optional directory for marshalled code objects that survive restarts
+MCP_CODE_CACHE_DIR = os.getenv("MCP_CODE_CACHE_DIR")
+# Files kept in MCP_CODE_CACHE_DIR; the least recently used are deleted past this
+MCP_CODE_CACHE_MAX_DISK_ENTRIES = int(os.getenv("MCP_CODE_CACHE_MAX_DISK_ENTRIES", "2048"))
+
+# Compile time in seconds, stored in front of the marshalled code on disk
+_HEADER = struct.Struct("<d")
+
+
+class CodeCache:
+    """Content-addressed cache of compiled tenant server source.
+
+    Keyed by the sha256 of the source, so identical code shared by several
+    servers compiles once. Entries live in an in-memory LRU and, when
+    ``cache_dir`` is set, in a bounded set of marshal files named after the
+    interpreter's bytecode magic number so a Python upgrade never loads
+    incompatible code.
+
+    Only server loads store entries; lookups with ``store=False`` (untrusted
+    /verify submissions) reuse a cached compile but never add one.
+    """
+
+    def __init__(self, maxsize: int = MCP_CODE_CACHE_MAX_ENTRIES, cache_dir: Optional[str] = MCP_CODE_CACHE_DIR,
+                 max_disk_entries: int = MCP_CODE_CACHE_MAX_DISK_ENTRIES):
+        # digest -> (code object, seconds it took to compile); LRU only, no expiry
+        self._memory = TTLCache(maxsize, float("inf"))
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_entries = max_disk_entries
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._magic = importlib.util.MAGIC_NUMBER.hex()
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self.uncached_compiles = 0
+        self.compiles = 0
+        self.compile_seconds = 0.0
+        self.compile_seconds_saved = 0.0
+
+    @staticmethod
+    def digest(source_code: str) -> str:
+        return hashlib.sha256(source_code.encode()).hexdigest()
+
+    def _disk_path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.{self._magic}.marshal"
+
+    def _load_from_disk(self, digest: str):
+        path = self._disk_path(digest)
+        try:
+            data = path.read_bytes()
+            # The file's mtime is its recency for _prune_disk
+            os.utime(path)
+            (compile_seconds,) = _HEADER.unpack_from(data)
+            return marshal.loads(data[_HEADER.size:]), compile_seconds
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            return None
+
+    def _store_on_disk(self, digest: str, code: CodeType, compile_seconds: float):
+        path = self._disk_path(digest)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_bytes(_HEADER.pack(compile_seconds) + marshal.dumps(code))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write code cache entry {digest}: {e}")
+            return
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the least recently used files beyond ``max_disk_entries``."""
+        try:
+            entries = []
+            for path in self.cache_dir.glob("*.marshal"):
+                try:
+                    entries.append((path.stat().st_mtime, path))
+                except OSError:
+                    continue
+            if len(entries) <= self.max_disk_entries:
+                return
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_disk_entries]:
+                try:
+                    path.unlink()
+                    self.disk_evictions += 1
+                except OSError:
+                    pass
+        except OSError as e:
+            print(f"Could not prune code cache directory: {e}")
+
+    def get_code(self, source_code: str, store: bool = True) -> CodeType:
+        """Return the compiled module code for ``source_code``, compiling only on a miss.
+
+        With ``store=False`` a miss is compiled without being cached, so
+        arbitrary submissions cannot fill the disk or evict servers' entries.
+        """
+        digest = self.digest(source_code)
+
+        entry = self._memory.get(digest)
+        if entry is None and self.cache_dir:
+            entry = self._load_from_disk(digest)
+            if entry is not None:
+                self.disk_hits += 1
+                self._memory.set(digest, entry)
+        if entry is not None:
+            code, compile_seconds = entry
+            self.compile_seconds_saved += compile_seconds
+            return code
+
+        started = time.perf_counter()
+        code = compile(source_code, f"<mcp-server:{digest[:12]}>", "exec")
+        compile_seconds = time.perf_counter() - started
+        if not store:
+            self.uncached_compiles += 1
+            return code
+
+        self.compiles += 1
+        self.compile_seconds += compile_seconds
+        self._memory.set(digest, (code, compile_seconds))
+        if self.cache_dir:
+            self._store_on_disk(digest, code, compile_seconds)
+        return code
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self._memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        hits = memory["hits"] + self.disk_hits
+        return {
+            "size": memory["size"],
+            "maxsize": memory["maxsize"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "disk_evictions": self.disk_evictions,
+            "uncached_compiles": self.uncached_compiles,
+            "compiles": self.compiles,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "evictions": memory["evictions"],
+            "compile_ms": round(self.compile_seconds * 1000, 2),
+            "compile_ms_saved": round(self.compile_seconds_saved * 1000, 2),
+        }
+
+
+code_cache = CodeCache()
@@ -1,7 +1,141 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
 from eth_account.messages import encode_defunct
 from eth_account import Account
 
 
+# 0 disables the process pool and recovers signatures inline on the event loop
+SIGNATURE_WORKERS = int(os.getenv("SIGNATURE_WORKERS", "0"))
+SIGNATURE_BATCH_WINDOW_MS = float(os.getenv("SIGNATURE_BATCH_WINDOW_MS", "2"))
+SIGNATURE_MAX_BATCH = int(os.getenv("SIGNATURE_MAX_BATCH", "64"))
+
+
+def recover_signers(batch: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """Recover the lowercase signer address of each (message, signature) pair.
+
+    Runs inside pool workers, so it must stay a picklable module-level function.
+    Invalid signatures yield None.
+    """
+    signers = []
+    for message, signature in batch:
+        try:
+            recovered = Account.recover_message(encode_defunct(text=message), signature=signature)
+            signers.append(recovered.lower())
+        except Exception as e:
+            print(f"Signature verification error: {e}")
+            signers.append(None)
+    return signers
+
+
+class SignatureVerifier:
+    """Runs secp256k1 public-key recovery off the event loop.
+
+    Concurrent verifications are collected for up to ``batch_window_ms`` (or
+    until ``max_batch`` are pending) and shipped to the process pool in one
+    chunk per worker, which amortizes the pickling round-trip. Without workers,
+    or when the pool breaks, recovery falls back to running inline.
+    """
+
+    def __init__(self, workers: int = SIGNATURE_WORKERS,
+                 batch_window_ms: float = SIGNATURE_BATCH_WINDOW_MS,
+                 max_batch: int = SIGNATURE_MAX_BATCH):
+        self.workers = workers
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.inline_fallbacks = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and DB threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def recover(self, message: str, signature: str) -> Optional[str]:
+        if self.workers <= 0:
+            return recover_signers([(message, signature)])[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, signature, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        chunk_size = math.ceil(len(pending) / self.workers)
+        for start in range(0, len(pending), chunk_size):
+            self._submit(pending[start:start + chunk_size])
+
+    def _submit(self, chunk: List[Tuple[str, str, asyncio.Future]]):
+        pairs = [(message, signature) for message, signature, _ in chunk]
+        self.batches += 1
+        try:
+            work = asyncio.wrap_future(self._get_executor().submit(recover_signers, pairs))
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._recover_inline(chunk, pairs, e)
+            return
+
+        def deliver(done: asyncio.Future):
+            if done.cancelled():
+                for _, _, future in chunk:
+                    future.cancel()
+                return
+            if done.exception() is not None:
+                self._recover_inline(chunk, pairs, done.exception())
+                return
+            for (_, _, future), signer in zip(chunk, done.result()):
+                if not future.done():
+                    future.set_result(signer)
+
+        work.add_done_callback(deliver)
+
+    def _recover_inline(self, chunk, pairs, error: BaseException):
+        print(f"Signature pool unavailable, verifying inline: {error}")
+        self.inline_fallbacks += 1
+        if isinstance(error, BrokenProcessPool):
+            # Start a fresh pool on the next batch
+            self._executor = None
+        for (_, _, future), signer in zip(chunk, recover_signers(pairs)):
+            if not future.done():
+                future.set_result(signer)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "inline_fallbacks": self.inline_fallbacks,
+        }
+
+
+signature_verifier = SignatureVerifier()
+
+
 class CryptoService:
     @staticmethod
     def verify_signature(message: str, signature: str, wallet_address: str) -> bool:
@@ -30,6 +164,12 @@ class CryptoService:
             print(f"Signature verification error: {e}")
             return False
 
+    @staticmethod
+    async def verify_signature_async(message: str, signature: str, wallet_address: str) -> bool:
+        """Like verify_signature, but the recovery runs on the signature process pool."""
+        recovered_address = await signature_verifier.recover(message, signature)
+        return recovered_address is not None and recovered_address == wallet_address.lower()
+
     @staticmethod
     def normalize_wallet_address(wallet_address: str) -> str:
         """Normalize wallet address to lowercase for consistent storage."""
@@ -0,0 +1,116 @@
+import hmac
+import ipaddress
+import os
+from typing import Iterable, List, Optional, Tuple
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+
+# Connection-scoped headers that must not be relayed between hops
+HOP_BY_HOP_HEADERS = {
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"transfer-encoding", b"upgrade", b"host"
+}
+
+# Original client address, set by our own hops (API -> worker, node -> node)
+CLIENT_IP_HEADER = b"x-mcp-client-ip"
+
+# Marks a hop from our API process to one of its workers; the value is a random
+# secret the worker pool hands its workers in MCP_WORKER_HOP_SECRET (not configured)
+WORKER_HOP_HEADER = b"x-mcp-worker-hop"
+WORKER_HOP_SECRET = os.getenv("MCP_WORKER_HOP_SECRET", "")
+
+# Long-lived SSE streams must not hit a read timeout; only connecting is bounded
+PROXY_TIMEOUT = httpx.Timeout(None, connect=5.0)
+
+
+def forwardable_headers(raw_headers: Iterable[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Drop hop-by-hop headers; names are lower-cased as ASGI expects."""
+    return [
+        (name.lower(), value) for name, value in raw_headers
+        if name.lower() not in HOP_BY_HOP_HEADERS
+    ]
+
+
+def from_api_process(request: Request) -> bool:
+    """Whether this worker process received the request from its own API process."""
+    presented = request.headers.get(WORKER_HOP_HEADER.decode())
+    if not (WORKER_HOP_SECRET and presented):
+        return False
+    # As bytes: compare_digest rejects non-ASCII str, which a client can send
+    return hmac.compare_digest(presented.encode("latin-1"), WORKER_HOP_SECRET.encode())
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """The caller's IP address, looking through our own proxy hops.
+
+    The client IP header is only trusted when relayed by our own API process
+    or another cluster node; anything that is not a valid IP address is dropped.
+    """
+    peer = request.client.host if request.client else None
+    candidate = peer
+    forwarded = request.headers.get(CLIENT_IP_HEADER.decode())
+    if forwarded and _trusted_hop(request):
+        candidate = forwarded
+    try:
+        return str(ipaddress.ip_address(candidate)) if candidate else None
+    except ValueError:
+        return None
+
+
+def _trusted_hop(request: Request) -> bool:
+    if from_api_process(request):
+        return True
+    # Imported here because the cluster forwards through this module
+    from services.cluster import cluster
+    return cluster.enabled and cluster.is_peer(request)
+
+
+def _has_body(request: Request) -> bool:
+    content_length = request.headers.get("content-length")
+    return "transfer-encoding" in request.headers or bool(content_length and content_length != "0")
+
+
+async def proxy_request(
+    client: httpx.AsyncClient,
+    request: Request,
+    url: str,
+    extra_headers: Optional[List[Tuple[bytes, bytes]]] = None
+) -> Response:
+    """Relay ``request`` to ``url`` through ``client``, streaming both bodies.
+
+    The upstream response is passed through as it arrives, so SSE streams from
+    the MCP transport are not buffered. Connection failures become a 502.
+    """
+    headers = [
+        (name, value) for name, value in forwardable_headers(request.headers.raw)
+        if name not in (CLIENT_IP_HEADER, WORKER_HOP_HEADER)
+    ]
+    ip = client_ip(request)
+    if ip:
+        headers.append((CLIENT_IP_HEADER, ip.encode()))
+    headers += extra_headers or []
+    upstream_request = client.build_request(
+        request.method,
+        url,
+        headers=headers,
+        content=request.stream() if _has_body(request) else None
+    )
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        return JSONResponse({
+            "status": "error",
+            "message": f"Upstream unavailable: {e}"
+        }, status_code=502)
+
+    response = StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        background=BackgroundTask(upstream.aclose)
+    )
+    response.raw_headers = forwardable_headers(upstream.headers.raw)
+    return response
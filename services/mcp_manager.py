@@ -0,0 +1,719 @@
+import asyncio
+import contextlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+from mcp.server.fastmcp import FastMCP
+from services.code_cache import code_cache
+from services.server_db_service import ServerDatabaseService
+from services.tool_cache import ToolResultCache, cacheable
+from services.tool_executor import ToolExecutor
+from utils.cache import TTLCache
+from utils.hosted_context import HostedContext
+from utils.memory import deep_sizeof, process_rss_bytes, traced_allocations
+
+
+# Servers kept loaded at once; the least recently used idle one is evicted past this
+MCP_MAX_RESIDENT_SERVERS = int(os.getenv("MCP_MAX_RESIDENT_SERVERS", "100"))
+# Servers without a request for this long are unloaded; 0 disables the idle reaper
+MCP_IDLE_TIMEOUT_SECONDS = float(os.getenv("MCP_IDLE_TIMEOUT_SECONDS", "900"))
+MCP_REAPER_INTERVAL_SECONDS = float(os.getenv("MCP_REAPER_INTERVAL_SECONDS", "30"))
+# A failed load is replayed to callers for this long instead of re-running it
+MCP_LOAD_FAILURE_TTL_SECONDS = float(os.getenv("MCP_LOAD_FAILURE_TTL_SECONDS", "10"))
+# How often loaded servers are checked against their rows; 0 disables hot swapping
+MCP_FRESHNESS_INTERVAL_SECONDS = float(os.getenv("MCP_FRESHNESS_INTERVAL_SECONDS", "15"))
+# Slugs per freshness query
+MCP_FRESHNESS_BATCH_SIZE = 500
+# Most recently used servers to load at startup; 0 disables prewarming
+MCP_PREWARM_SERVERS = int(os.getenv("MCP_PREWARM_SERVERS", "0"))
+MCP_PREWARM_CONCURRENCY = int(os.getenv("MCP_PREWARM_CONCURRENCY", "8"))
+# Startup waits at most this long; unfinished loads carry on in the background
+MCP_PREWARM_BUDGET_SECONDS = float(os.getenv("MCP_PREWARM_BUDGET_SECONDS", "20"))
+# After a hot swap, the old instance keeps serving its open MCP sessions for at most this long
+MCP_SESSION_DRAIN_SECONDS = float(os.getenv("MCP_SESSION_DRAIN_SECONDS", "300"))
+# Total memory attributed to loaded servers before the largest idle ones are evicted; 0 disables
+MCP_MEMORY_BUDGET_MB = float(os.getenv("MCP_MEMORY_BUDGET_MB", "0"))
+# Trace allocations during loads and sample each server's size; always on with a budget
+MCP_MEMORY_TRACKING = os.getenv("MCP_MEMORY_TRACKING", "false").lower() in ("1", "true", "yes") or MCP_MEMORY_BUDGET_MB > 0
+MCP_MEMORY_SAMPLE_INTERVAL_SECONDS = float(os.getenv("MCP_MEMORY_SAMPLE_INTERVAL_SECONDS", "60"))
+# Objects visited per server per sample, bounding how long one sample can take
+MCP_MEMORY_SAMPLE_MAX_OBJECTS = int(os.getenv("MCP_MEMORY_SAMPLE_MAX_OBJECTS", "1000000"))
+
+
+def _replay_failure(error_type: type, message: str) -> Exception:
+    """A fresh exception for a cached load failure, so no traceback piles up across requests."""
+    try:
+        return error_type(message)
+    except Exception:
+        return RuntimeError(message)
+
+
+class LoadedServer:
+    """A tenant FastMCP instance, its ASGI app and the task hosting its session manager."""
+
+    def __init__(
+        self,
+        slug: str,
+        server_id: Any,
+        mcp_server: FastMCP,
+        version: Any = None,
+        source_md5: Optional[str] = None,
+        tier: Optional[str] = None,
+        result_cache: Optional[ToolResultCache] = None,
+        tool_executor: Optional[ToolExecutor] = None,
+        namespace: Optional[Dict[str, Any]] = None,
+        load_memory: Optional[Dict[str, int]] = None
+    ):
+        self.slug = slug
+        self.server_id = server_id
+        self.mcp_server = mcp_server
+        # Owner's subscription tier, which sizes the server's bulkhead
+        self.tier = tier
+        # The row's updated_at and source digest this instance was built from
+        self.version = version
+        self.source_md5 = source_md5
+        # Digest of a newer source that failed to load; not retried until it changes again
+        self.rejected_md5: Optional[str] = None
+        # Results of @cacheable tools; dropped with this instance when the source changes
+        self.result_cache = result_cache if result_cache is not None else ToolResultCache()
+        # Thread pool the server's synchronous tools run on
+        self.tool_executor = tool_executor if tool_executor is not None else ToolExecutor(slug)
+        # Globals the source was exec'd in, where its module-level data lives
+        self.namespace = namespace if namespace is not None else {}
+        # Bytes allocated while the source ran (tracemalloc), and the latest deep-size sample
+        self.load_bytes = load_memory["bytes"] if load_memory else None
+        self.load_peak_bytes = load_memory["peak_bytes"] if load_memory else None
+        self.sampled_bytes: Optional[int] = None
+        self.sampled_objects: Optional[int] = None
+        self.sample_truncated = False
+        self.sampled_at: Optional[float] = None
+        # Built once per load; this also creates the session manager hosted below
+        self.app = mcp_server.streamable_http_app()
+        self.session = HostedContext(mcp_server.session_manager.run, name=f"mcp-session:{slug}")
+        self.loaded_at = time.monotonic()
+        self.last_used = self.loaded_at
+        self.in_flight = 0
+        # Loaded by prewarm() and not requested yet
+        self.prewarmed = False
+        # Set once evicted; the session is closed when the last request finishes
+        self.retired = False
+        # Set when swapped out with MCP sessions open; they are served here until this deadline
+        self.drain_deadline: Optional[float] = None
+
+    def idle_seconds(self, now: float) -> float:
+        return now - self.last_used
+
+    def _sessions(self) -> Dict[str, Any]:
+        # Stateful servers keep a transport per mcp-session-id; stateless ones never add any
+        return getattr(self.mcp_server.session_manager, "_server_instances", None) or {}
+
+    def open_sessions(self) -> int:
+        # Terminated (DELETEd) transports can linger in the map
+        return sum(1 for transport in self._sessions().values() if not getattr(transport, "is_terminated", False))
+
+    def has_session(self, session_id: str) -> bool:
+        transport = self._sessions().get(session_id)
+        return transport is not None and not getattr(transport, "is_terminated", False)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Best current estimate: the latest sample, else what the load allocated."""
+        if self.sampled_bytes is not None:
+            return self.sampled_bytes
+        return self.load_bytes or 0
+
+    def measure(self, max_objects: int = MCP_MEMORY_SAMPLE_MAX_OBJECTS) -> Dict[str, Any]:
+        """Deep size of the server's module-level data and cached tool results.
+
+        The FastMCP instance itself is left out: its size is the framework's
+        and about the same for every server.
+        """
+        roots = [
+            value for name, value in list(self.namespace.items())
+            if name != '__builtins__' and not isinstance(value, FastMCP)
+        ]
+        roots.append(self.result_cache)
+        return deep_sizeof(roots, namespace=self.namespace, max_objects=max_objects)
+
+
+class DynamicMCPManager:
+    """Loads tenant MCP servers from the database and keeps a bounded set resident.
+
+    Residency is LRU ordered. A server is only torn down once it has no
+    requests in flight: evicting a busy server removes it from the map so new
+    requests load a fresh copy, and the old one closes when it drains.
+
+    Loads are single-flight per slug: concurrent requests for a server that is
+    not resident share one load task, and a failed load is cached briefly so
+    a broken server is not fetched and exec'd again for every request.
+
+    Resident servers are periodically checked against their rows in one
+    batched query. Changed source is loaded in the background and swapped in
+    atomically while the old instance drains; deactivated or deleted servers
+    are evicted. Requests carrying an MCP session id that the old instance
+    issued keep going to it until those sessions end or MCP_SESSION_DRAIN_SECONDS
+    pass, since the new instance does not know them.
+
+    With memory tracking on, each load is measured with tracemalloc and
+    resident servers are re-measured periodically; past the memory budget the
+    largest idle servers are evicted first.
+    """
+
+    def __init__(
+        self,
+        max_resident: int = MCP_MAX_RESIDENT_SERVERS,
+        idle_timeout: float = MCP_IDLE_TIMEOUT_SECONDS,
+        reaper_interval: float = MCP_REAPER_INTERVAL_SECONDS,
+        failure_ttl: float = MCP_LOAD_FAILURE_TTL_SECONDS,
+        freshness_interval: float = MCP_FRESHNESS_INTERVAL_SECONDS,
+        session_drain_seconds: float = MCP_SESSION_DRAIN_SECONDS,
+        memory_tracking: bool = MCP_MEMORY_TRACKING,
+        memory_budget_mb: float = MCP_MEMORY_BUDGET_MB,
+        memory_sample_interval: float = MCP_MEMORY_SAMPLE_INTERVAL_SECONDS
+    ):
+        self.max_resident = max_resident
+        self.idle_timeout = idle_timeout
+        self.reaper_interval = reaper_interval
+        self.freshness_interval = freshness_interval
+        self.session_drain_seconds = session_drain_seconds
+        self.memory_tracking = memory_tracking
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.memory_sample_interval = memory_sample_interval
+        self.active_servers: "OrderedDict[str, LoadedServer]" = OrderedDict()
+        self._draining: Set[LoadedServer] = set()
+        self._evicted_slugs: Set[str] = set()
+        self._reaper: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._sampler: Optional[asyncio.Task] = None
+        self._swapping: Dict[str, asyncio.Task] = {}
+        self._session_drains: Set[asyncio.Task] = set()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._failures = TTLCache(max(max_resident, 1) * 10, failure_ttl)
+        self.loads = 0
+        self.reloads = 0
+        self.coalesced_loads = 0
+        self.load_failures = 0
+        self.cached_failures = 0
+        self.swaps = 0
+        self.swap_failures = 0
+        self.session_routed = 0
+        self.session_drain_timeouts = 0
+        self.freshness_checks = 0
+        self.prewarmed = 0
+        self.cold_loads_avoided = 0
+        self.last_prewarm: Optional[Dict[str, Any]] = None
+        self.memory_samples = 0
+        self.last_memory_sample_ms: Optional[float] = None
+        self.evictions: Dict[str, int] = {"capacity": 0, "idle": 0, "manual": 0, "deactivated": 0, "memory": 0}
+
+    def _ensure_background_tasks(self):
+        loop = asyncio.get_running_loop()
+        if self.idle_timeout > 0 and (self._reaper is None or self._reaper.done()):
+            self._reaper = loop.create_task(self._reap_forever())
+        if self.freshness_interval > 0 and (self._refresher is None or self._refresher.done()):
+            self._refresher = loop.create_task(self._refresh_forever())
+        if self.memory_tracking and self.memory_sample_interval > 0 and (self._sampler is None or self._sampler.done()):
+            self._sampler = loop.create_task(self._sample_forever())
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(self.reaper_interval)
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                print(f"MCP idle reaper failed: {e}")
+
+    async def _refresh_forever(self):
+        while True:
+            await asyncio.sleep(self.freshness_interval)
+            try:
+                await self.check_freshness()
+            except Exception as e:
+                print(f"MCP freshness check failed: {e}")
+
+    async def _sample_forever(self):
+        while True:
+            await asyncio.sleep(self.memory_sample_interval)
+            try:
+                await self.sample_memory()
+            except Exception as e:
+                print(f"MCP memory sampling failed: {e}")
+
+    async def load_server_from_db(self, server_slug: str) -> LoadedServer:
+        """Load an MCP server from database and execute its code"""
+        try:
+            # Get server configuration from database by slug
+            server_data = await ServerDatabaseService.get_server_with_source_code(server_slug)
+
+            if not server_data:
+                raise ValueError(f"Server with slug '{server_slug}' not found or inactive")
+
+            source_code = server_data.get('source_code')
+            if not source_code:
+                raise ValueError(f"No source code found for server {server_slug}")
+
+            # Execute the source code to create the MCP server; compilation is cached by content
+            exec_globals = {'FastMCP': FastMCP, 'cacheable': cacheable}
+            code = code_cache.get_code(source_code)
+            load_memory = None
+            if self.memory_tracking:
+                # exec is synchronous, so nothing else on the loop allocates meanwhile
+                with traced_allocations() as load_memory:
+                    exec(code, exec_globals)
+            else:
+                exec(code, exec_globals)
+
+            # Find the created MCP server instance
+            mcp_server = None
+            for var_name, var_value in exec_globals.items():
+                if isinstance(var_value, FastMCP):
+                    mcp_server = var_value
+                    break
+
+            if not mcp_server:
+                raise ValueError(f"No FastMCP instance found in server {server_slug} source code")
+
+            # Sync tools move off the event loop first, so a cache hit never waits for a thread
+            tool_executor = ToolExecutor.for_server(server_slug, server_data.get('tool_executor_config'))
+            tool_executor.install(mcp_server)
+            result_cache = ToolResultCache()
+            result_cache.install(mcp_server)
+
+            loaded = LoadedServer(
+                server_slug, server_data.get('id'), mcp_server,
+                version=server_data.get('updated_at'),
+                source_md5=server_data.get('source_md5'),
+                tier=server_data.get('subscription_tier'),
+                result_cache=result_cache,
+                tool_executor=tool_executor,
+                namespace=exec_globals,
+                load_memory=load_memory
+            )
+            await loaded.session.start()
+
+            return loaded
+
+        except Exception as e:
+            print(f"Error loading server {server_slug}: {e}")
+            raise
+
+    async def get_or_create_server(self, server_slug: str) -> LoadedServer:
+        """Get existing server or create new one from database"""
+        self._ensure_background_tasks()
+        loaded = self.active_servers.get(server_slug)
+        if loaded is not None:
+            self.active_servers.move_to_end(server_slug)
+            return loaded
+
+        failure = self._failures.get(server_slug)
+        if failure is not None:
+            self.cached_failures += 1
+            raise _replay_failure(*failure)
+
+        task = self._loading.get(server_slug)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load(server_slug), name=f"mcp-load:{server_slug}")
+            self._loading[server_slug] = task
+        else:
+            self.coalesced_loads += 1
+        # Shielded so a cancelled caller does not abort the load for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, server_slug: str) -> LoadedServer:
+        try:
+            loaded = await self.load_server_from_db(server_slug)
+        except Exception as e:
+            self.load_failures += 1
+            # Type and message only: the exception itself would pin its frames, and every re-raise adds more
+            self._failures.set(server_slug, (type(e), str(e)))
+            raise
+        finally:
+            self._loading.pop(server_slug, None)
+
+        self.active_servers[server_slug] = loaded
+        self.loads += 1
+        if server_slug in self._evicted_slugs:
+            self._evicted_slugs.discard(server_slug)
+            self.reloads += 1
+        await self._enforce_capacity(keep=server_slug)
+        await self._enforce_memory_budget(keep=server_slug)
+        return loaded
+
+    def _session_owner(self, server_slug: str, session_id: str) -> Optional[LoadedServer]:
+        """A swapped-out instance still serving ``session_id``, if any."""
+        for loaded in self._draining:
+            if loaded.slug == server_slug and loaded.drain_deadline is not None and loaded.has_session(session_id):
+                return loaded
+        return None
+
+    @contextlib.asynccontextmanager
+    async def use_server(self, server_slug: str, session_id: Optional[str] = None) -> AsyncIterator[LoadedServer]:
+        """Pin a loaded server for the duration of one request.
+
+        ``session_id`` is the request's mcp-session-id header; a session opened
+        on an instance that has since been swapped out stays on that instance.
+        """
+        loaded = self._session_owner(server_slug, session_id) if session_id and self._draining else None
+        if loaded is not None:
+            self.session_routed += 1
+        else:
+            loaded = await self.get_or_create_server(server_slug)
+            # A server evicted while this caller waited on its load is already closed
+            while loaded.retired:
+                loaded = await self.get_or_create_server(server_slug)
+        if loaded.prewarmed:
+            loaded.prewarmed = False
+            self.cold_loads_avoided += 1
+        loaded.in_flight += 1
+        loaded.last_used = time.monotonic()
+        try:
+            yield loaded
+        finally:
+            loaded.in_flight -= 1
+            loaded.last_used = time.monotonic()
+            # A session-draining instance is closed by its drain task
+            if loaded.retired and loaded.in_flight == 0 and loaded.drain_deadline is None:
+                await self._close(loaded)
+
+    async def prewarm(
+        self,
+        limit: int = MCP_PREWARM_SERVERS,
+        concurrency: int = MCP_PREWARM_CONCURRENCY,
+        budget_seconds: float = MCP_PREWARM_BUDGET_SECONDS,
+        owns: Optional[Callable[[str], bool]] = None
+    ) -> Dict[str, Any]:
+        """Load the most recently used servers before traffic arrives.
+
+        At most ``concurrency`` loads run at once and the call returns after
+        ``budget_seconds``; loads still running then finish in the background.
+        ``owns`` restricts prewarming to the slugs this process serves.
+        """
+        started = time.perf_counter()
+        slugs = await ServerDatabaseService.list_popular_server_slugs(min(limit, self.max_resident))
+        if owns is not None:
+            slugs = [slug for slug in slugs if owns(slug)]
+
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def warm(slug: str):
+            async with semaphore:
+                loaded = await self.get_or_create_server(slug)
+                loaded.prewarmed = True
+
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(warm(slug)) for slug in slugs]
+        done, pending = await asyncio.wait(tasks, timeout=budget_seconds) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        failed = sum(1 for task in done if task.exception() is not None)
+        self.prewarmed += len(done) - failed
+        self.last_prewarm = {
+            "candidates": len(slugs),
+            "loaded": len(done) - failed,
+            "failed": failed,
+            "over_budget": len(pending),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+        print(f"Prewarmed MCP servers: {self.last_prewarm}")
+        return self.last_prewarm
+
+    async def _enforce_capacity(self, keep: Optional[str] = None):
+        # Oldest first; busy servers and the one just loaded are skipped, so the
+        # map may briefly overshoot when every other server has requests in flight
+        for slug in list(self.active_servers):
+            if len(self.active_servers) <= self.max_resident:
+                break
+            loaded = self.active_servers.get(slug)
+            if loaded is not None and slug != keep and loaded.in_flight == 0:
+                await self.evict(slug, reason="capacity")
+
+    def memory_bytes(self) -> int:
+        return sum(loaded.memory_bytes for loaded in self.active_servers.values())
+
+    async def _enforce_memory_budget(self, keep: Optional[str] = None) -> int:
+        """Evict idle servers, largest first, until within the memory budget."""
+        if self.memory_budget_bytes <= 0:
+            return 0
+        total = self.memory_bytes()
+        if total <= self.memory_budget_bytes:
+            return 0
+        candidates = sorted(
+            (loaded for slug, loaded in self.active_servers.items() if slug != keep and loaded.in_flight == 0),
+            key=lambda loaded: loaded.memory_bytes,
+            reverse=True
+        )
+        evicted = 0
+        for loaded in candidates:
+            if total <= self.memory_budget_bytes:
+                break
+            # Skip a server replaced by a swap since the list was built
+            if self.active_servers.get(loaded.slug) is not loaded or loaded.in_flight:
+                continue
+            total -= loaded.memory_bytes
+            await self.evict(loaded.slug, reason="memory")
+            evicted += 1
+        if total > self.memory_budget_bytes:
+            print(f"MCP servers use {total} bytes, over the {self.memory_budget_bytes} byte budget, with nothing idle to evict")
+        return evicted
+
+    async def sample_memory(self) -> Dict[str, Any]:
+        """Measure every resident server, then apply the memory budget.
+
+        Each measurement walks the server's objects in the default executor so
+        the event loop keeps serving between them.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        for loaded in list(self.active_servers.values()):
+            if loaded.retired:
+                continue
+            size = await loop.run_in_executor(None, loaded.measure)
+            loaded.sampled_bytes = size["bytes"]
+            loaded.sampled_objects = size["objects"]
+            loaded.sample_truncated = size["truncated"]
+            loaded.sampled_at = time.monotonic()
+        self.memory_samples += 1
+        self.last_memory_sample_ms = round((time.perf_counter() - started) * 1000, 2)
+        evicted = await self._enforce_memory_budget()
+        return {"servers": len(self.active_servers), "evicted": evicted, "ms": self.last_memory_sample_ms}
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Per-server memory, largest first, with totals and the budget."""
+        now = time.monotonic()
+        servers = sorted(self.active_servers.values(), key=lambda loaded: loaded.memory_bytes, reverse=True)
+        return {
+            "tracking": self.memory_tracking,
+            "budget_bytes": self.memory_budget_bytes or None,
+            "attributed_bytes": self.memory_bytes(),
+            "process_rss_bytes": process_rss_bytes(),
+            "samples": self.memory_samples,
+            "last_sample_ms": self.last_memory_sample_ms,
+            "memory_evictions": self.evictions.get("memory", 0),
+            "servers": [
+                {
+                    "slug": loaded.slug,
+                    "memory_bytes": loaded.memory_bytes,
+                    "load_bytes": loaded.load_bytes,
+                    "load_peak_bytes": loaded.load_peak_bytes,
+                    "sampled_bytes": loaded.sampled_bytes,
+                    "sampled_objects": loaded.sampled_objects,
+                    "sample_truncated": loaded.sample_truncated,
+                    "sample_age_seconds": round(now - loaded.sampled_at, 1) if loaded.sampled_at is not None else None,
+                    "cached_results": len(loaded.result_cache),
+                    "in_flight": loaded.in_flight,
+                    "idle_seconds": round(loaded.idle_seconds(now), 1)
+                }
+                for loaded in servers
+            ]
+        }
+
+    async def reap_idle(self) -> int:
+        """Evict servers that have been idle longer than the idle timeout."""
+        now = time.monotonic()
+        idle = [
+            slug for slug, loaded in self.active_servers.items()
+            if loaded.in_flight == 0 and loaded.idle_seconds(now) >= self.idle_timeout
+        ]
+        for slug in idle:
+            await self.evict(slug, reason="idle")
+        return len(idle)
+
+    async def check_freshness(self) -> int:
+        """Compare resident servers with their rows; returns how many changed."""
+        self.freshness_checks += 1
+        slugs = list(self.active_servers)
+        changed = 0
+        for start in range(0, len(slugs), MCP_FRESHNESS_BATCH_SIZE):
+            batch = slugs[start:start + MCP_FRESHNESS_BATCH_SIZE]
+            versions = await ServerDatabaseService.get_server_versions(batch)
+            for slug in batch:
+                loaded = self.active_servers.get(slug)
+                if loaded is None:
+                    continue
+                row = versions.get(slug)
+                if row is None:
+                    await self.evict(slug, reason="deactivated")
+                    changed += 1
+                elif row['source_md5'] != loaded.source_md5:
+                    if row['source_md5'] != loaded.rejected_md5:
+                        self._schedule_swap(slug, row['source_md5'])
+                        changed += 1
+                else:
+                    # updated_at also moves on edits that leave the source alone; nothing to reload
+                    loaded.version = row['updated_at']
+        return changed
+
+    def _schedule_swap(self, server_slug: str, source_md5: str):
+        if server_slug in self._swapping:
+            return
+        task = asyncio.get_running_loop().create_task(self._swap(server_slug, source_md5), name=f"mcp-swap:{server_slug}")
+        self._swapping[server_slug] = task
+
+    async def _swap(self, server_slug: str, source_md5: str):
+        """Load the current version next to the resident one, then switch over."""
+        try:
+            try:
+                fresh = await self.load_server_from_db(server_slug)
+            except Exception:
+                # The old version keeps serving until the source changes again
+                self.swap_failures += 1
+                current = self.active_servers.get(server_slug)
+                if current is not None:
+                    current.rejected_md5 = source_md5
+                return
+
+            current = self.active_servers.get(server_slug)
+            if current is None:
+                # Evicted while loading; do not resurrect it
+                fresh.retired = True
+                await self._close(fresh)
+                return
+
+            # Same key, so the LRU position is kept; new requests see the new
+            # instance from here on while the old one finishes its requests
+            self.active_servers[server_slug] = fresh
+            self.swaps += 1
+            await self._retire(current, drain_sessions=True)
+        finally:
+            self._swapping.pop(server_slug, None)
+
+    async def evict(self, server_slug: str, reason: str = "manual") -> bool:
+        """Unload a server; a busy one is closed once its last request finishes."""
+        self._failures.invalidate(server_slug)
+        loaded = self.active_servers.pop(server_slug, None)
+        if loaded is None:
+            return False
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        self._evicted_slugs.add(server_slug)
+        await self._retire(loaded)
+        return True
+
+    async def _retire(self, loaded: LoadedServer, drain_sessions: bool = False):
+        loaded.retired = True
+        if drain_sessions and loaded.open_sessions() and self.session_drain_seconds > 0:
+            loaded.drain_deadline = time.monotonic() + self.session_drain_seconds
+            self._draining.add(loaded)
+            task = asyncio.get_running_loop().create_task(self._drain_sessions(loaded), name=f"mcp-drain:{loaded.slug}")
+            self._session_drains.add(task)
+            task.add_done_callback(self._session_drains.discard)
+        elif loaded.in_flight == 0:
+            await self._close(loaded)
+        else:
+            self._draining.add(loaded)
+
+    async def _drain_sessions(self, loaded: LoadedServer, poll_interval: float = 1.0):
+        """Close a swapped-out instance once its sessions and requests end, or at its deadline."""
+        while loaded.open_sessions() or loaded.in_flight:
+            if time.monotonic() >= loaded.drain_deadline:
+                self.session_drain_timeouts += 1
+                break
+            await asyncio.sleep(poll_interval)
+        await self._close(loaded)
+
+    async def _close(self, loaded: LoadedServer):
+        self._draining.discard(loaded)
+        try:
+            await loaded.session.stop()
+        except Exception as e:
+            print(f"Error closing server {loaded.slug}: {e}")
+        loaded.tool_executor.shutdown()
+
+    async def cleanup_server(self, server_slug: str):
+        """Cleanup server resources"""
+        await self.evict(server_slug)
+
+    async def shutdown(self):
+        """Stop background tasks and close every loaded server, including draining ones."""
+        for task in [self._reaper, self._refresher, self._sampler, *self._swapping.values(), *self._loading.values(), *self._session_drains]:
+            if task is None:
+                continue
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
+        self._reaper = self._refresher = self._sampler = None
+        servers = list(self.active_servers.values()) + list(self._draining)
+        self.active_servers.clear()
+        for loaded in servers:
+            loaded.retired = True
+            await self._close(loaded)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "resident": len(self.active_servers),
+            "max_resident": self.max_resident,
+            "draining": len(self._draining),
+            "in_flight": sum(loaded.in_flight for loaded in self.active_servers.values()),
+            "idle_timeout_seconds": self.idle_timeout,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "loading": len(self._loading),
+            "coalesced_loads": self.coalesced_loads,
+            "load_failures": self.load_failures,
+            "cached_failures": self.cached_failures,
+            "freshness_checks": self.freshness_checks,
+            "swaps": self.swaps,
+            "swap_failures": self.swap_failures,
+            "draining_sessions": sum(loaded.open_sessions() for loaded in self._draining),
+            "session_routed": self.session_routed,
+            "session_drain_timeouts": self.session_drain_timeouts,
+            "prewarmed": self.prewarmed,
+            "cold_loads_avoided": self.cold_loads_avoided,
+            "last_prewarm": self.last_prewarm,
+            "evictions": dict(self.evictions),
+            "memory": {
+                "tracking": self.memory_tracking,
+                "budget_bytes": self.memory_budget_bytes or None,
+                "attributed_bytes": self.memory_bytes(),
+                "samples": self.memory_samples,
+                "last_sample_ms": self.last_memory_sample_ms
+            },
+            "tool_cache": self.tool_cache_stats(),
+            "tool_executor": self.tool_executor_stats()
+        }
+
+    def tool_executor_stats(self, top: int = 5) -> Dict[str, Any]:
+        """Sync tool thread pools summed over resident servers, plus the longest waits."""
+        executors = [loaded.tool_executor for loaded in self.active_servers.values() if loaded.tool_executor.tools]
+        longest_waits = sorted(executors, key=lambda executor: executor.wait.quantile(0.95) or 0, reverse=True)[:top]
+        return {
+            "servers": len(executors),
+            "queued": sum(executor.queued for executor in executors),
+            "running": sum(executor.running for executor in executors),
+            "calls": sum(executor.calls for executor in executors),
+            "timeouts": sum(executor.timeouts for executor in executors),
+            "cancelled": sum(executor.cancelled for executor in executors),
+            "abandoned": sum(executor.abandoned for executor in executors),
+            "wait_ms_total": round(sum(executor.wait.sum_ms for executor in executors), 3),
+            "execution_ms_total": round(sum(executor.execution.sum_ms for executor in executors), 3),
+            "longest_waits": {
+                executor.slug: {
+                    "max_workers": executor.max_workers,
+                    "wait_p95_ms": executor.wait.quantile(0.95),
+                    "execution_p95_ms": executor.execution.quantile(0.95)
+                }
+                for executor in longest_waits
+            }
+        }
+
+    def tool_cache_stats(self) -> Dict[str, Any]:
+        """@cacheable tool result caches summed over resident servers."""
+        caches = [loaded.result_cache.stats() for loaded in self.active_servers.values() if loaded.result_cache.tools]
+        hits = sum(cache["hits"] for cache in caches)
+        misses = sum(cache["misses"] for cache in caches)
+        return {
+            "servers": len(caches),
+            "tools": sum(len(cache["tools"]) for cache in caches),
+            "entries": sum(cache["size"] for cache in caches),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "uncacheable": sum(cache["uncacheable"] for cache in caches)
+        }
+
+
+# Global instance
+mcp_manager = DynamicMCPManager()
@@ -0,0 +1,119 @@
+import bisect
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+# Distinct slug/method/tool series kept; later ones fold into an "_other" series per method
+MCP_METRICS_MAX_SERIES = int(os.getenv("MCP_METRICS_MAX_SERIES", "5000"))
+
+OTHER = "_other"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and two adds."""
+
+    __slots__ = ("counts", "count", "sum_ms", "errors", "tool_errors")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+        self.tool_errors = 0
+
+    def observe(self, latency_ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float("inf") else None
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "tool_errors": self.tool_errors,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {
+                ("+Inf" if bound == float("inf") else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)
+            }
+        }
+
+
+class MCPMetrics:
+    """Latency histograms and error counts per slug, JSON-RPC method and tool."""
+
+    def __init__(self, max_series: int = MCP_METRICS_MAX_SERIES):
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, str, Optional[str]], Histogram] = {}
+        self.folded = 0
+
+    def _histogram(self, slug: str, method: str, tool: Optional[str]) -> Histogram:
+        key = (slug, method, tool)
+        histogram = self._series.get(key)
+        if histogram is None:
+            if len(self._series) >= self.max_series:
+                self.folded += 1
+                key = (OTHER, method, None)
+                histogram = self._series.get(key)
+                if histogram is not None:
+                    return histogram
+            histogram = self._series[key] = Histogram()
+        return histogram
+
+    def observe(self, slug: str, calls: List[Dict[str, Any]], status: Optional[int],
+                latency_ms: float, rpc_errors: int = 0, tool_errors: int = 0):
+        """Record one HTTP exchange against every JSON-RPC call it carried.
+
+        Errors cannot be matched to a call inside a batch, so they are charged
+        to the first call; nearly every request carries exactly one.
+        """
+        failed = status is not None and status >= 400
+        for index, call in enumerate(calls):
+            histogram = self._histogram(slug, call["method"], call["tool"])
+            histogram.observe(latency_ms)
+            if index == 0:
+                histogram.errors += rpc_errors + (1 if failed and not rpc_errors else 0)
+                histogram.tool_errors += tool_errors
+
+    def series(self) -> List[Dict[str, Any]]:
+        return [
+            {"slug": slug, "method": method, "tool": tool, **histogram.to_dict()}
+            for (slug, method, tool), histogram in self._series.items()
+        ]
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Summary for /metrics: totals and the slowest series by mean latency."""
+        histograms = list(self._series.values())
+        slowest = sorted(self.series(), key=lambda item: item["mean_ms"] or 0, reverse=True)[:top]
+        for item in slowest:
+            item.pop("buckets")
+        return {
+            "series": len(histograms),
+            "max_series": self.max_series,
+            "folded": self.folded,
+            "calls": sum(histogram.count for histogram in histograms),
+            "errors": sum(histogram.errors for histogram in histograms),
+            "tool_errors": sum(histogram.tool_errors for histogram in histograms),
+            "slowest": slowest
+        }
+
+
+# Global instance
+mcp_metrics = MCPMetrics()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Process-isolated execution of tenant MCP servers.
+
+With MCP_EXECUTION_MODE=workers the API process starts MCP_WORKERS child
+processes. Each one runs its own DynamicMCPManager behind uvicorn on a unix
+socket, and every slug is pinned to one worker by hash, so each worker hosts
+a subset of the servers. The API proxies /servers/{slug}/mcp traffic to the
+owning worker and restarts workers that exit.
+
+Worker entry point: python -m services.mcp_workers --socket PATH --parent-pid PID [--index I --workers N]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import secrets
+import signal
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import httpx
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from services.http_proxy import PROXY_TIMEOUT, WORKER_HOP_HEADER, proxy_request
+
+
+# inline (default) runs tenant servers in the API process; workers uses the pool below
+MCP_EXECUTION_MODE = os.getenv("MCP_EXECUTION_MODE", "inline").lower()
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "0")) or (os.cpu_count() or 1)
+MCP_WORKER_SOCKET_DIR = os.getenv("MCP_WORKER_SOCKET_DIR") or tempfile.gettempdir()
+MCP_WORKER_START_TIMEOUT = float(os.getenv("MCP_WORKER_START_TIMEOUT", "30"))
+MCP_WORKER_RESTART_DELAY = float(os.getenv("MCP_WORKER_RESTART_DELAY", "1"))
+
+
+def worker_index(server_slug: str, workers: int) -> int:
+    """Stable slug -> worker assignment, so a server only loads in one process."""
+    return zlib.crc32(server_slug.encode()) % workers
+
+
+class MCPWorker:
+    """One supervised worker process and the client that talks to its socket."""
+
+    def __init__(self, index: int, workers: int, socket_path: str, hop_secret: str):
+        self.index = index
+        self.workers = workers
+        self.socket_path = socket_path
+        self.hop_secret = hop_secret
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.ready = asyncio.Event()
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+        self.proxied = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def spawn(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+        env = dict(os.environ, MCP_EXECUTION_MODE="inline", MCP_WORKER_HOP_SECRET=self.hop_secret)
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "services.mcp_workers",
+            "--socket", self.socket_path,
+            "--parent-pid", str(os.getpid()),
+            "--index", str(self.index),
+            "--workers", str(self.workers),
+            env=env
+        )
+        self.started_at = time.monotonic()
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.socket_path),
+                timeout=PROXY_TIMEOUT
+            )
+        await self._wait_ready()
+
+    async def _wait_ready(self):
+        deadline = time.monotonic() + MCP_WORKER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if not self.alive:
+                raise RuntimeError(f"MCP worker {self.index} exited during start-up")
+            with contextlib.suppress(httpx.HTTPError):
+                response = await self.client.get("http://mcp-worker/healthz")
+                if response.status_code == 200:
+                    self.ready.set()
+                    return
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"MCP worker {self.index} did not become ready in {MCP_WORKER_START_TIMEOUT}s")
+
+    async def stop(self, timeout: float = 10.0):
+        self.ready.clear()
+        if self.alive:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive,
+            "ready": self.ready.is_set(),
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1) if self.alive and self.started_at else 0,
+            "restarts": self.restarts,
+            "proxied": self.proxied
+        }
+
+
+class MCPWorkerPool:
+    """Starts, supervises and routes to the tenant server worker processes."""
+
+    def __init__(self, workers: int = MCP_WORKERS, socket_dir: str = MCP_WORKER_SOCKET_DIR):
+        self.size = max(workers, 1)
+        self.socket_dir = socket_dir
+        self.workers: List[MCPWorker] = []
+        self._supervisors: List[asyncio.Task] = []
+        self._stopping = False
+        # Lets a worker tell our relayed requests from anything else reaching its socket
+        self.hop_secret = secrets.token_urlsafe(32)
+        self.proxy_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return MCP_EXECUTION_MODE == "workers"
+
+    async def start(self):
+        self._stopping = False
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self.workers = [
+            MCPWorker(
+                index, self.size, os.path.join(self.socket_dir, f"mcp-worker-{os.getpid()}-{index}.sock"), self.hop_secret
+            )
+            for index in range(self.size)
+        ]
+        await asyncio.gather(*(worker.spawn() for worker in self.workers))
+        loop = asyncio.get_running_loop()
+        self._supervisors = [loop.create_task(self._supervise(worker)) for worker in self.workers]
+        print(f"Started {self.size} MCP worker processes")
+
+    async def _supervise(self, worker: MCPWorker):
+        """Restart the worker whenever it exits, until the pool shuts down."""
+        while not self._stopping:
+            returncode = await worker.process.wait()
+            worker.ready.clear()
+            if self._stopping:
+                return
+            print(f"MCP worker {worker.index} exited with {returncode}; restarting")
+            worker.restarts += 1
+            while not self._stopping:
+                await asyncio.sleep(MCP_WORKER_RESTART_DELAY)
+                try:
+                    await worker.spawn()
+                    break
+                except Exception as e:
+                    print(f"Failed to restart MCP worker {worker.index}: {e}")
+                    if worker.alive:
+                        worker.process.kill()
+                        await worker.process.wait()
+
+    def worker_for(self, server_slug: str) -> MCPWorker:
+        return self.workers[worker_index(server_slug, len(self.workers))]
+
+    def restart_worker(self, index: int):
+        """Stop one worker; its supervisor brings it back and its slugs reload there."""
+        worker = self.workers[index]
+        if worker.alive:
+            worker.process.terminate()
+
+    async def proxy(self, request: Request, server_slug: str) -> Response:
+        worker = self.worker_for(server_slug)
+        try:
+            await asyncio.wait_for(worker.ready.wait(), MCP_WORKER_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.proxy_errors += 1
+            return JSONResponse({
+                "status": "error",
+                "message": f"MCP worker {worker.index} is unavailable"
+            }, status_code=503)
+        worker.proxied += 1
+        url = f"http://mcp-worker{request.url.path}"
+        if request.url.query:
+            url += f"?{request.url.query}"
+        response = await proxy_request(
+            worker.client, request, url, extra_headers=[(WORKER_HOP_HEADER, worker.hop_secret.encode())]
+        )
+        if response.status_code == 502:
+            self.proxy_errors += 1
+        return response
+
+    async def shutdown(self):
+        self._stopping = True
+        for task in self._supervisors:
+            task.cancel()
+        for task in self._supervisors:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._supervisors = []
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        for worker in self.workers:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(worker.socket_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": MCP_EXECUTION_MODE,
+            "size": self.size if self.enabled else 0,
+            "proxy_errors": self.proxy_errors,
+            "workers": [worker.stats() for worker in self.workers]
+        }
+
+    async def collect_mcp_series(self) -> List[Dict[str, Any]]:
+        """Per-tool latency series from every ready worker; slugs never overlap between workers."""
+
+        async def fetch(worker: MCPWorker):
+            if not worker.ready.is_set():
+                return []
+            with contextlib.suppress(httpx.HTTPError, ValueError):
+                response = await worker.client.get("http://mcp-worker/mcp-metrics", timeout=2.0)
+                return response.json().get("series", [])
+            return []
+
+        return [item for series in await asyncio.gather(*(fetch(worker) for worker in self.workers)) for item in series]
+
+    async def collect_memory(self, sample: bool = False) -> List[Dict[str, Any]]:
+        """Each ready worker's memory report; ``sample`` re-measures its servers first."""
+
+        async def fetch(worker: MCPWorker):
+            report = {"index": worker.index, "pid": worker.process.pid if worker.process else None}
+            if not worker.ready.is_set():
+                return {**report, "error": "not ready"}
+            try:
+                response = await worker.client.get(
+                    "http://mcp-worker/memory", params={"sample": "true"} if sample else None, timeout=30.0
+                )
+                return {**report, **response.json().get("memory", {})}
+            except (httpx.HTTPError, ValueError) as e:
+                return {**report, "error": str(e)}
+
+        return list(await asyncio.gather(*(fetch(worker) for worker in self.workers)))
+
+    async def collect_stats(self) -> Dict[str, Any]:
+        """stats() plus each ready worker's own MCP manager counters."""
+        stats = self.stats()
+
+        async def fetch(worker: MCPWorker):
+            if not worker.ready.is_set():
+                return None
+            with contextlib.suppress(httpx.HTTPError, ValueError):
+                response = await worker.client.get("http://mcp-worker/healthz", timeout=1.0)
+                return response.json().get("mcp_servers")
+            return None
+
+        remote = await asyncio.gather(*(fetch(worker) for worker in self.workers))
+        for worker_stats, servers in zip(stats["workers"], remote):
+            worker_stats["mcp_servers"] = servers
+        return stats
+
+
+# Global instance
+mcp_worker_pool = MCPWorkerPool()
+
+
+def create_worker_app(parent_pid: int, index: int = 0, workers: int = 1):
+    """The Starlette app a worker process serves: the MCP dispatch route only."""
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.authentication import AuthenticationMiddleware
+    from starlette.routing import Mount, Route, Router
+    from routes.servers import dynamic_mcp_handler
+    from services.cluster import cluster
+    from services.mcp_manager import MCP_PREWARM_SERVERS, mcp_manager
+    from services.mcp_metrics import mcp_metrics
+    from services.supabase_client import supabase_client
+    from services.usage_logger import usage_logger
+    from utils.auth_middleware import JWTAuthBackend
+
+    async def healthz(request):
+        return JSONResponse({"status": "success", "mcp_servers": mcp_manager.stats()})
+
+    async def metrics(request):
+        return JSONResponse({"status": "success", "series": mcp_metrics.series()})
+
+    async def memory(request):
+        if request.query_params.get("sample") == "true":
+            await mcp_manager.sample_memory()
+        return JSONResponse({"status": "success", "memory": mcp_manager.memory_report()})
+
+    async def watch_parent():
+        # Exit if the API process dies without stopping us
+        while os.getppid() == parent_pid:
+            await asyncio.sleep(2)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        await supabase_client.open()
+        watcher = asyncio.get_running_loop().create_task(watch_parent())
+        if MCP_PREWARM_SERVERS > 0:
+            # Before /healthz answers, so the pool only routes here once warm
+            await mcp_manager.prewarm(owns=lambda slug: worker_index(slug, workers) == index and cluster.owns(slug))
+        try:
+            yield
+        finally:
+            watcher.cancel()
+            await mcp_manager.shutdown()
+            await usage_logger.shutdown()
+            await supabase_client.close_connection()
+
+    return Starlette(
+        routes=[
+            Route("/healthz", healthz, methods=["GET"]),
+            Route("/mcp-metrics", metrics, methods=["GET"]),
+            Route("/memory", memory, methods=["GET"]),
+            Mount("/servers", Router([
+                Route("/{slug:path}", dynamic_mcp_handler, methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
+            ]))
+        ],
+        # Same principal resolution as the API, for usage attribution
+        middleware=[Middleware(AuthenticationMiddleware, backend=JWTAuthBackend())],
+        lifespan=lifespan
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--parent-pid", type=int, required=True)
+    parser.add_argument("--index", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run(create_worker_app(args.parent_pid, args.index, args.workers), uds=args.socket, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import abc
+import asyncio
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from services.auth_service import NONCE_EXPIRATION_MINUTES
+from services.user_service import user_service
+
+
+NONCE_STORE_BACKEND = os.getenv("NONCE_STORE", "postgres")
+NONCE_STORE_MAX_ENTRIES = int(os.getenv("NONCE_STORE_MAX_ENTRIES", "100000"))
+NONCE_STORE_SWEEP_INTERVAL = float(os.getenv("NONCE_STORE_SWEEP_INTERVAL", "30"))
+
+
+class NonceStore(abc.ABC):
+    """Holds issued login nonces until they are consumed or expire."""
+
+    @abc.abstractmethod
+    async def issue(self, wallet_address: str, nonce: str) -> None:
+        """Park ``nonce`` for the wallet, replacing any earlier one."""
+
+    @abc.abstractmethod
+    async def consume(self, wallet_address: str, nonce: str) -> Optional[Dict[str, Any]]:
+        """Invalidate the nonce if it matches and is unexpired.
+
+        Returns the user fields needed for the JWT (wallet_address,
+        display_name, subscription_tier, is_active), or None on mismatch.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+class PostgresNonceStore(NonceStore):
+    """Keeps the nonce on the users row; works with any number of workers."""
+
+    async def issue(self, wallet_address: str, nonce: str) -> None:
+        await user_service.upsert_user_nonce(wallet_address, nonce)
+
+    async def consume(self, wallet_address: str, nonce: str) -> Optional[Dict[str, Any]]:
+        return await user_service.consume_user_nonce(wallet_address, nonce)
+
+
+class MemoryNonceStore(NonceStore):
+    """Process-local TTL map; /auth/nonce does not touch the database at all.
+
+    Only valid when one process serves both /auth/nonce and /auth/verify
+    (a single uvicorn worker), since nonces are not shared between processes.
+    The map is bounded (oldest entries are evicted first) and swept
+    periodically; the user row is created on the first successful login.
+    """
+
+    def __init__(self, ttl_seconds: float = NONCE_EXPIRATION_MINUTES * 60,
+                 max_entries: int = NONCE_STORE_MAX_ENTRIES,
+                 sweep_interval: float = NONCE_STORE_SWEEP_INTERVAL):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        # wallet -> (nonce, expires_at); insertion order is expiry order since the TTL is fixed
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.issued = 0
+        self.consumed = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Drop expired entries from the front of the map."""
+        now = time.monotonic()
+        removed = 0
+        while self._entries:
+            wallet_address, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[wallet_address]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    async def issue(self, wallet_address: str, nonce: str) -> None:
+        self._ensure_sweeper()
+        key = wallet_address.lower()
+        self._entries.pop(key, None)
+        self._entries[key] = (nonce, time.monotonic() + self.ttl_seconds)
+        self.issued += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    async def consume(self, wallet_address: str, nonce: str) -> Optional[Dict[str, Any]]:
+        key = wallet_address.lower()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.rejected += 1
+            return None
+
+        stored_nonce, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            self.rejected += 1
+            return None
+        if not secrets.compare_digest(stored_nonce.encode(), nonce.encode()):
+            self.rejected += 1
+            return None
+
+        # No await between the check and the delete, so the nonce is single-use
+        del self._entries[key]
+        self.consumed += 1
+        return await user_service.ensure_user(wallet_address)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "issued": self.issued,
+            "consumed": self.consumed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+
+def create_nonce_store(backend: str = NONCE_STORE_BACKEND) -> NonceStore:
+    if backend == "memory":
+        return MemoryNonceStore()
+    if backend == "postgres":
+        return PostgresNonceStore()
+    raise ValueError(f"Unknown NONCE_STORE backend: {backend}")
+
+
+nonce_store = create_nonce_store()
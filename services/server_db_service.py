@@ -1,69 +1,153 @@
 import json
 import uuid
 from typing import Optional, Dict, List, Any
+from psycopg2 import errors as pg_errors
 from services.supabase_client import supabase_client
 
 
+SLUG_EXISTS = supabase_client.prepare(
+    "server_slug_exists",
+    "SELECT id FROM servers WHERE slug = %s"
+)
+SERVER_BY_SLUG = supabase_client.prepare("server_by_slug", """
+    SELECT id, name, slug, description, version, status, created_at
+    FROM servers
+    WHERE slug = %s
+""")
+ACTIVE_SERVERS = supabase_client.prepare("active_servers", """
+    SELECT id, name, slug, description, version, status
+    FROM servers
+    WHERE status = 'active'
+    ORDER BY created_at DESC
+""")
+SERVER_SOURCE_BY_SLUG = supabase_client.prepare("server_source_by_slug", """
+    SELECT s.id, s.name, s.slug, s.source_code, s.status, s.updated_at,
+           md5(s.source_code) AS source_md5, u.subscription_tier,
+           s.package_json -> 'tool_executor' AS tool_executor_config
+    FROM servers s
+    LEFT JOIN users u ON u.wallet_address = s.wallet_address
+    WHERE s.slug = %s AND s.status = 'active'
+""")
+# Prewarm candidates: most recently used first, busiest first among equals
+POPULAR_SERVER_SLUGS = supabase_client.prepare("popular_server_slugs", """
+    SELECT slug
+    FROM servers
+    WHERE status = 'active'
+    ORDER BY last_accessed_at DESC NULLS LAST, total_requests DESC
+    LIMIT %s
+""")
+# Freshness check for loaded servers; slugs missing from the result are gone or inactive
+SERVER_VERSIONS = supabase_client.prepare("server_versions", """
+    SELECT slug, updated_at, md5(source_code) AS source_md5
+    FROM servers
+    WHERE slug = ANY(%s) AND status = 'active'
+""")
+
+# Resolves the first free slug ("name", else "name-<max N + 1>") and inserts in
+# one round-trip. The transaction-scoped advisory lock makes creates of the same
+# base slug take turns, and the INSERT's snapshot is taken after the lock is
+# granted, so it sees the slug the previous holder committed. Base slugs only
+# contain [a-z0-9-], so they are safe to embed in the LIKE and regex patterns.
+CREATE_SERVER_WITH_UNIQUE_SLUG = """
+    SELECT pg_advisory_xact_lock(hashtext(%(base_slug)s));
+    WITH taken AS (
+        SELECT slug FROM servers
+        WHERE slug = %(base_slug)s
+           OR (slug LIKE %(base_slug)s || '-%%' AND slug ~ ('^' || %(base_slug)s || '-[0-9]+$'))
+    )
+    INSERT INTO servers (
+        id, wallet_address, name, slug, description, version,
+        status, visibility, source_code, tags, category,
+        total_requests, is_featured, created_at, updated_at
+    )
+    SELECT
+        %(id)s, %(wallet_address)s, %(name)s,
+        CASE
+            WHEN NOT EXISTS (SELECT 1 FROM taken WHERE slug = %(base_slug)s) THEN %(base_slug)s
+            ELSE %(base_slug)s || '-' || (
+                SELECT COALESCE(MAX(substring(slug FROM '-([0-9]+)$')::bigint), 0) + 1
+                FROM taken WHERE slug <> %(base_slug)s
+            )
+        END,
+        %(description)s, %(version)s, %(status)s, %(visibility)s, %(source_code)s,
+        %(tags)s, %(category)s, 0, FALSE, NOW(), NOW()
+    RETURNING id, name, slug, description, version, status, visibility,
+              category, tags, created_at
+"""
+SLUG_CONFLICT_RETRIES = 3
+
+
+class SlugConflictError(Exception):
+    """No free slug could be claimed for a new server; the create can be retried."""
+
+
 class ServerDatabaseService:
     """Database service for server operations"""
     
     @staticmethod
-    def check_slug_exists(slug: str) -> bool:
+    async def check_slug_exists(slug: str) -> bool:
         """Check if a server slug already exists"""
-        query = "SELECT id FROM servers WHERE slug = %s"
-        result = supabase_client.execute_query(query, (slug,))
+        result = await supabase_client.execute_prepared(SLUG_EXISTS, (slug,))
         return bool(result)
     
     @staticmethod
-    def generate_unique_slug(base_slug: str) -> str:
-        """Generate a unique slug by appending numbers if needed"""
-        slug = base_slug
-        counter = 1
+    def serialize_server_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a servers row into a JSON-serializable dict"""
+        server_data = dict(row)
         
-        while ServerDatabaseService.check_slug_exists(slug):
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-            
-        return slug
+        # Convert datetime to string for JSON serialization
+        if 'created_at' in server_data and server_data['created_at']:
+            server_data['created_at'] = server_data['created_at'].isoformat()
+        
+        # Parse tags JSON if present
+        if server_data.get('tags'):
+            try:
+                server_data['tags'] = json.loads(server_data['tags'])
+            except:
+                server_data['tags'] = []
+        
+        return server_data
     
     @staticmethod
-    def create_server(server_data: Dict[str, Any]) -> str:
-        """Create a new server in the database and return the server ID"""
-        server_id = str(uuid.uuid4())
+    async def create_server(server_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new server under a unique slug and return the created row.
         
-        insert_query = """
-            INSERT INTO servers (
-                id, wallet_address, name, slug, description, version, 
-                status, visibility, source_code, tags, category, 
-                total_requests, is_featured, created_at, updated_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW()
-            )
+        ``server_data['slug']`` is the base slug; it is used as-is when free and
+        otherwise suffixed with the next free ``-N``. The slug is resolved and the
+        row inserted in one round-trip, so there is no per-candidate lookup.
+        Creates of the same base slug are serialized by an advisory lock; a
+        unique violation can then only come from a slug written outside this
+        path, and is retried a few times before raising SlugConflictError.
         """
-        
         # Convert tags to JSON string if provided
         tags_json = json.dumps(server_data.get('tags')) if server_data.get('tags') else None
         
-        supabase_client.execute_query(insert_query, (
-            server_id,
-            server_data['wallet_address'],
-            server_data['name'],
-            server_data['slug'],
-            server_data.get('description', ''),
-            server_data.get('version', '1.0.0'),
-            server_data.get('status', 'active'),
-            server_data.get('visibility', 'private'),
-            server_data['source_code'],
-            tags_json,
-            server_data.get('category', 'general'),
-            0,  # total_requests
-            False  # is_featured
-        ))
+        params = {
+            'wallet_address': server_data['wallet_address'],
+            'name': server_data['name'],
+            'base_slug': server_data['slug'],
+            'description': server_data.get('description', ''),
+            'version': server_data.get('version', '1.0.0'),
+            'status': server_data.get('status', 'active'),
+            'visibility': server_data.get('visibility', 'private'),
+            'source_code': server_data['source_code'],
+            'tags': tags_json,
+            'category': server_data.get('category', 'general'),
+        }
         
-        return server_id
+        for attempt in range(SLUG_CONFLICT_RETRIES):
+            params['id'] = str(uuid.uuid4())
+            try:
+                # The creator's next reads stay on the primary until replicas catch up
+                async with supabase_client.transaction(sticky_key=params['wallet_address'].lower()) as tx:
+                    result = await tx.execute(CREATE_SERVER_WITH_UNIQUE_SLUG, params)
+                return ServerDatabaseService.serialize_server_row(result[0])
+            except pg_errors.UniqueViolation as e:
+                if attempt == SLUG_CONFLICT_RETRIES - 1:
+                    raise SlugConflictError(f"Could not claim a unique slug for '{params['base_slug']}', please retry") from e
     
     @staticmethod
-    def get_server_by_id(server_id: str) -> Optional[Dict[str, Any]]:
+    async def get_server_by_id(server_id: str) -> Optional[Dict[str, Any]]:
         """Get server data by ID"""
         query = """
             SELECT id, name, slug, description, version, status, visibility, 
@@ -71,35 +155,19 @@ class ServerDatabaseService:
             FROM servers 
             WHERE id = %s
         """
-        result = supabase_client.execute_query(query, (server_id,))
+        result = await supabase_client.execute_query(query, (server_id,))
         
         if not result:
             return None
-            
-        server_data = dict(result[0])
         
-        # Convert datetime to string for JSON serialization
-        if 'created_at' in server_data and server_data['created_at']:
-            server_data['created_at'] = server_data['created_at'].isoformat()
-        
-        # Parse tags JSON if present
-        if server_data.get('tags'):
-            try:
-                server_data['tags'] = json.loads(server_data['tags'])
-            except:
-                server_data['tags'] = []
-        
-        return server_data
+        return ServerDatabaseService.serialize_server_row(result[0])
     
     @staticmethod
-    def get_server_by_slug(slug: str) -> Optional[Dict[str, Any]]:
-        """Get server data by slug"""
-        query = """
-            SELECT id, name, slug, description, version, status, created_at
-            FROM servers 
-            WHERE slug = %s
-        """
-        result = supabase_client.execute_query(query, (slug,))
+    async def get_server_by_slug(slug: str, sticky_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get server data by slug; a slug missing on a replica is re-read on the primary"""
+        result = await supabase_client.execute_prepared(
+            SERVER_BY_SLUG, (slug,), sticky_key=sticky_key, primary_on_miss=True
+        )
         
         if not result:
             return None
@@ -113,27 +181,37 @@ class ServerDatabaseService:
         return server_data
     
     @staticmethod
-    def list_active_servers() -> List[Dict[str, Any]]:
+    async def list_active_servers() -> List[Dict[str, Any]]:
         """List all active servers"""
-        query = """
-            SELECT id, name, slug, description, version, status
-            FROM servers 
-            WHERE status = 'active'
-            ORDER BY created_at DESC
-        """
-        result = supabase_client.execute_query(query)
+        result = await supabase_client.execute_prepared(ACTIVE_SERVERS)
         
         return [dict(row) for row in result] if result else []
     
     @staticmethod
-    def get_server_with_source_code(slug: str) -> Optional[Dict[str, Any]]:
-        """Get server with source code for execution"""
-        query = """
-            SELECT id, name, slug, source_code, status
-            FROM servers 
-            WHERE slug = %s AND status = 'active'
+    async def list_popular_server_slugs(limit: int) -> List[str]:
+        """Slugs of the active servers with the most recent usage"""
+        result = await supabase_client.execute_prepared(POPULAR_SERVER_SLUGS, (limit,))
+        
+        return [row['slug'] for row in result] if result else []
+    
+    @staticmethod
+    async def get_server_versions(slugs: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Current updated_at and source digest of the active servers among ``slugs``"""
+        if not slugs:
+            return {}
+        result = await supabase_client.execute_prepared(SERVER_VERSIONS, (list(slugs),))
+        
+        return {row['slug']: dict(row) for row in result} if result else {}
+    
+    @staticmethod
+    async def get_server_with_source_code(slug: str) -> Optional[Dict[str, Any]]:
+        """Get server with source code for execution.
+
+        Loads run in whichever worker process or node owns the slug, where the
+        creator's stickiness is not known, so a miss on a replica is re-read
+        on the primary instead of reporting a just-created server as missing.
         """
-        result = supabase_client.execute_query(query, (slug,))
+        result = await supabase_client.execute_prepared(SERVER_SOURCE_BY_SLUG, (slug,), primary_on_miss=True)
         
         if not result:
             return None
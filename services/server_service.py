@@ -67,7 +67,11 @@ class ServerService:
     
     @staticmethod
     def generate_slug(name: str) -> str:
-        """Generate a URL-friendly slug from server name"""
+        """Generate a URL-friendly base slug from server name.
+        
+        Uniqueness is resolved when the row is inserted (see
+        ServerDatabaseService.create_server).
+        """
         # Convert to lowercase and replace spaces/underscores with hyphens
         slug = name.lower().replace(" ", "-").replace("_", "-")
         
@@ -84,8 +88,7 @@ class ServerService:
         if not slug:
             slug = "server"
         
-        # Ensure unique slug
-        return ServerDatabaseService.generate_unique_slug(slug)
+        return slug
     
     @staticmethod
     def prepare_server_data(input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -115,7 +118,7 @@ class ServerService:
         return server_data
     
     @staticmethod
-    def create_server(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_server(input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new server with validation and business logic"""
         # Validate input data
         errors = ServerService.validate_create_server_data(input_data)
@@ -125,12 +128,5 @@ class ServerService:
         # Prepare server data
         server_data = ServerService.prepare_server_data(input_data)
         
-        # Create server in database
-        server_id = ServerDatabaseService.create_server(server_data)
-        
-        # Get and return the created server data
-        created_server = ServerDatabaseService.get_server_by_id(server_id)
-        if not created_server:
-            raise RuntimeError("Failed to retrieve created server")
-        
-        return created_server
\ No newline at end of file
+        # Create server in database; the row comes back via RETURNING
+        return await ServerDatabaseService.create_server(server_data)
\ No newline at end of file
@@ -1,41 +1,568 @@
+import asyncio
+import itertools
 import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import errors as pg_errors
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+DB_REPLICA_RETRY_INTERVAL = float(os.getenv("DB_REPLICA_RETRY_INTERVAL", "30"))
+DB_READ_AFTER_WRITE_WINDOW = float(os.getenv("DB_READ_AFTER_WRITE_WINDOW", "5"))
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection became available within the acquire timeout."""
+
+
+class PooledConnection:
+    """A raw psycopg2 connection plus the bookkeeping the pool needs."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.last_used = time.monotonic()
+        # Names of statements already prepared on this server session
+        self.prepared: Set[str] = set()
+        self.in_transaction = False
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.raw.closed)
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections that can be checked out from async code.
+
+    psycopg2 is blocking, so every round-trip runs on a dedicated thread pool
+    sized to the connection limit. The event loop only awaits the result, which
+    lets concurrent requests overlap their database I/O.
+    """
+
+    def __init__(self, dsn: str, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                 acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+                 health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._open_lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db-pool")
+        self._opened = False
+        self._size = 0
+        self._waiting = 0
+
+    async def run(self, fn, *args):
+        """Run a blocking callable on the pool's thread executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> PooledConnection:
+        raw = psycopg2.connect(self.dsn, cursor_factory=RealDictCursor)
+        # Single statements commit on their own; transactions opt out explicitly.
+        raw.autocommit = True
+        return PooledConnection(raw)
+
+    @staticmethod
+    def _ping(conn: PooledConnection) -> bool:
+        try:
+            with conn.raw.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close_raw(conn: PooledConnection):
+        try:
+            if not conn.closed:
+                conn.raw.close()
+        except psycopg2.Error:
+            pass
+
+    async def open(self):
+        """Open the pool and pre-create ``min_size`` connections."""
+        async with self._open_lock:
+            if self._opened:
+                return
+            self._opened = True
+            while self._size < self.min_size:
+                conn = await self.run(self._connect)
+                self._size += 1
+                self._idle.append(conn)
+
+    async def _is_healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        return await self.run(self._ping, conn)
+
+    def _discard(self, conn: PooledConnection):
+        self._size -= 1
+        # Closing may block behind a query still running on the connection (e.g.
+        # after a cancelled request), so never do it on the event loop.
+        self._executor.submit(self._close_raw, conn)
+
+    async def acquire(self) -> PooledConnection:
+        """Check out a healthy connection, waiting up to ``acquire_timeout`` seconds."""
+        if not self._opened:
+            await self.open()
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+            )
+        finally:
+            self._waiting -= 1
+
+        try:
+            while self._idle:
+                # LIFO keeps the warmest connections busy and lets the rest age out
+                conn = self._idle.pop()
+                try:
+                    healthy = await self._is_healthy(conn)
+                except BaseException:
+                    self._discard(conn)
+                    raise
+                if healthy:
+                    return conn
+                self._discard(conn)
+
+            self._size += 1
+            try:
+                return await self.run(self._connect)
+            except BaseException:
+                self._size -= 1
+                raise
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: PooledConnection, discard: bool = False):
+        """Return a connection to the pool, or drop it if it is broken."""
+        try:
+            # A connection still inside a transaction was abandoned mid-way
+            if discard or conn.closed or conn.in_transaction or not self._opened:
+                self._discard(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        """Close idle connections; checked-out ones are closed when released."""
+        self._opened = False
+        while self._idle:
+            conn = self._idle.pop()
+            self._size -= 1
+            await self.run(self._close_raw, conn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._size - len(self._idle),
+            "waiting": self._waiting,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+        }
+
+
+def is_read_query(query: str) -> bool:
+    """Plain SELECTs can be served by a replica; locking reads and writes cannot."""
+    normalized = query.strip().upper()
+    return normalized.startswith('SELECT') and 'FOR UPDATE' not in normalized and 'FOR SHARE' not in normalized
+
+
+class PreparedStatement:
+    """A named server-side prepared statement built from ``%s``-style SQL."""
+
+    def __init__(self, name: str, sql: str):
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", name):
+            raise ValueError(f"Invalid prepared statement name: {name}")
+
+        self.name = name
+        self.sql = sql
+        self.is_read = is_read_query(sql)
+
+        placeholders = itertools.count(1)
+        body = re.sub(r"%s", lambda _: f"${next(placeholders)}", sql)
+        self.param_count = next(placeholders) - 1
+        self.prepare_sql = f"PREPARE {name} AS {body}"
+        self.execute_sql = f"EXECUTE {name}"
+        if self.param_count:
+            self.execute_sql += f" ({', '.join(['%s'] * self.param_count)})"
+
+        self.hits = 0
+        self.prepares = 0
+
+
+class StatementRegistry:
+    """Named statements shared by every pooled connection.
+
+    Each connection prepares a statement the first time it runs it and reuses
+    it afterwards. A reconnect yields a fresh connection with nothing prepared,
+    so statements are transparently prepared again.
+    """
+
+    def __init__(self):
+        self._statements: Dict[str, PreparedStatement] = {}
+
+    def register(self, name: str, sql: str) -> PreparedStatement:
+        existing = self._statements.get(name)
+        if existing:
+            if existing.sql != sql:
+                raise ValueError(f"Prepared statement '{name}' is already registered with different SQL")
+            return existing
+        statement = PreparedStatement(name, sql)
+        self._statements[name] = statement
+        return statement
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(statement.hits for statement in self._statements.values())
+        prepares = sum(statement.prepares for statement in self._statements.values())
+        executions = hits + prepares
+        return {
+            "hits": hits,
+            "prepares": prepares,
+            "hit_rate": round(hits / executions, 4) if executions else None,
+            "statements": {
+                name: {"hits": statement.hits, "prepares": statement.prepares}
+                for name, statement in self._statements.items()
+            },
+        }
+
+
+class DatabaseConnection:
+    """A connection checked out for the duration of an ``async with`` block."""
+
+    def __init__(self, pool: ConnectionPool, conn: PooledConnection):
+        self.pool = pool
+        self.conn = conn
+
+    @staticmethod
+    def _execute(raw, query: str, params):
+        with raw.cursor() as cursor:
+            cursor.execute(query, params)
+            # Covers SELECT as well as INSERT/UPDATE ... RETURNING
+            if cursor.description is not None:
+                return cursor.fetchall()
+            return cursor.rowcount
+
+    def _statement_prefix(self) -> str:
+        return ""
+
+    async def execute(self, query: str, params=None):
+        return await self.pool.run(self._execute, self.conn.raw, self._statement_prefix() + query, params)
+
+    @staticmethod
+    def _execute_values(raw, query: str, rows, template: Optional[str]):
+        with raw.cursor() as cursor:
+            # One page, so the whole batch is a single statement
+            execute_values(cursor, query, rows, template=template, page_size=max(len(rows), 1))
+            return cursor.rowcount
+
+    async def execute_values(self, query: str, rows: List[tuple], template: Optional[str] = None):
+        """Run ``query`` with its ``VALUES %s`` expanded to all of ``rows``."""
+        return await self.pool.run(
+            self._execute_values, self.conn.raw, self._statement_prefix() + query, rows, template
+        )
+
+    @staticmethod
+    def _execute_prepared(conn: PooledConnection, statement: PreparedStatement, params, prefix: str = ""):
+        prepared_now = False
+        with conn.raw.cursor() as cursor:
+            for attempt in range(2):
+                if statement.name not in conn.prepared:
+                    cursor.execute(statement.prepare_sql)
+                    conn.prepared.add(statement.name)
+                    prepared_now = True
+                try:
+                    cursor.execute(prefix + statement.execute_sql, params)
+                    break
+                except (pg_errors.InvalidSqlStatementName, pg_errors.FeatureNotSupported) as e:
+                    # The server dropped the statement (e.g. DISCARD ALL behind a
+                    # bouncer) or its cached plan went stale after a schema change.
+                    # Inside a transaction the error has already aborted it.
+                    conn.prepared.discard(statement.name)
+                    if attempt or conn.in_transaction:
+                        raise
+                    if isinstance(e, pg_errors.FeatureNotSupported):
+                        cursor.execute(f"DEALLOCATE {statement.name}")
+            rows = cursor.fetchall() if cursor.description is not None else cursor.rowcount
+        return rows, prepared_now
+
+    async def execute_prepared(self, statement: PreparedStatement, params=None):
+        result, prepared_now = await self.pool.run(
+            self._execute_prepared, self.conn, statement, params, self._statement_prefix()
+        )
+        if prepared_now:
+            statement.prepares += 1
+        else:
+            statement.hits += 1
+        return result
+
+
+class Transaction(DatabaseConnection):
+    """A unit of work on one connection, committed or rolled back as a whole.
+
+    BEGIN travels with the first statement, so a transaction costs a single
+    extra round-trip (the COMMIT) over running its statements on their own.
+    """
+
+    def __init__(self, pool: ConnectionPool, conn: PooledConnection):
+        super().__init__(pool, conn)
+        self.begun = False
+
+    def _statement_prefix(self) -> str:
+        if self.begun:
+            return ""
+        self.begun = True
+        self.conn.in_transaction = True
+        return "BEGIN; "
+
+    async def _finish(self, command: str):
+        if self.begun:
+            await self.pool.run(self._execute, self.conn.raw, command, None)
+        self.conn.in_transaction = False
+
+    async def commit(self):
+        await self._finish("COMMIT")
+
+    async def rollback(self):
+        try:
+            await self._finish("ROLLBACK")
+        except psycopg2.Error as e:
+            # The connection stays flagged as in-transaction and is discarded on release
+            print(f"Rollback failed: {e}")
+
+
+class ReplicaNode:
+    """A read replica pool that is skipped for a while after it fails."""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self.down_until = 0.0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self):
+        self.failures += 1
+        self.down_until = time.monotonic() + DB_REPLICA_RETRY_INTERVAL
+
+
+# Read-after-write stickiness for the current request/task
+_primary_until: ContextVar[float] = ContextVar("primary_until", default=0.0)
+
+
 class SupabaseClient:
     def __init__(self):
         self.database_url = os.getenv("DATABASE_URL")
-        
+
         if not self.database_url:
             raise ValueError("DATABASE_URL must be set in environment variables")
-        
-        self.connection = None
-    
-    def get_connection(self):
-        if not self.connection or self.connection.closed:
-            self.connection = psycopg2.connect(
-                self.database_url,
-                cursor_factory=RealDictCursor
-            )
-        return self.connection
-    
-    def execute_query(self, query: str, params=None):
-        print("Connecting to:", self.database_url)
-        conn = self.get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, params)
-            if query.strip().upper().startswith('SELECT'):
-                return cursor.fetchall()
-            conn.commit()
-            return cursor.rowcount
-    
-    def close_connection(self):
-        if self.connection and not self.connection.closed:
-            self.connection.close()
+
+        self.pool = ConnectionPool(self.database_url)
+
+        replica_urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+        self.replicas: List[ReplicaNode] = [ReplicaNode(ConnectionPool(url)) for url in replica_urls]
+        self._replica_cursor = itertools.count()
+        # sticky_key -> monotonic deadline until which that key reads from the primary
+        self._recent_writers: Dict[str, float] = {}
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.replica_fallbacks = 0
+        self.replica_misses = 0
+        self.statements = StatementRegistry()
+
+    async def open(self):
+        """Warm the pools at startup; connecting stays lazy if the database is unreachable."""
+        try:
+            await self.pool.open()
+        except psycopg2.Error as e:
+            # The pool is open but empty; requests connect on demand, as before pooling
+            print(f"Database unavailable at startup, connecting lazily: {e}")
+        for replica in self.replicas:
+            try:
+                await replica.pool.open()
+            except psycopg2.Error as e:
+                print(f"Read replica unavailable at startup: {e}")
+                replica.mark_down()
+
+    @asynccontextmanager
+    async def _checkout(self, pool: ConnectionPool, factory=DatabaseConnection):
+        conn = await pool.acquire()
+        discard = False
+        try:
+            yield factory(pool, conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError, asyncio.CancelledError):
+            # Broken, or possibly still busy with a statement we stopped waiting for
+            discard = True
+            raise
+        finally:
+            pool.release(conn, discard=discard)
+
+    def connection(self):
+        """Check out one primary connection for several statements (e.g. per request)."""
+        return self._checkout(self.pool)
+
+    @asynccontextmanager
+    async def transaction(self, sticky_key: Optional[str] = None):
+        """Run the block's statements atomically on one primary connection.
+
+        Usage::
+
+            async with supabase_client.transaction() as tx:
+                rows = await tx.execute("INSERT ... RETURNING id", params)
+
+        Commits when the block exits normally and rolls back when it raises.
+        """
+        async with self._checkout(self.pool, Transaction) as tx:
+            try:
+                yield tx
+            except asyncio.CancelledError:
+                # The connection is discarded, which aborts the transaction server-side
+                raise
+            except BaseException:
+                await tx.rollback()
+                raise
+            await tx.commit()
+        self._record_write(sticky_key)
+
+    def _record_write(self, sticky_key: Optional[str]):
+        deadline = time.monotonic() + DB_READ_AFTER_WRITE_WINDOW
+        _primary_until.set(deadline)
+        if sticky_key:
+            if len(self._recent_writers) >= 10000:
+                now = time.monotonic()
+                self._recent_writers = {k: v for k, v in self._recent_writers.items() if v > now}
+            self._recent_writers[sticky_key] = deadline
+
+    def _must_read_primary(self, sticky_key: Optional[str]) -> bool:
+        now = time.monotonic()
+        if _primary_until.get() > now:
+            return True
+        return bool(sticky_key) and self._recent_writers.get(sticky_key, 0.0) > now
+
+    async def _read_from_replicas(self, run: Callable[[DatabaseConnection], Awaitable[Any]]):
+        """Try each healthy replica once in round-robin order; returns (served, result)."""
+        start = next(self._replica_cursor)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if not replica.healthy:
+                continue
+            try:
+                async with self._checkout(replica.pool) as conn:
+                    result = await run(conn)
+                self.replica_reads += 1
+                return True, result
+            except (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeoutError) as e:
+                print(f"Read replica failed, trying next node: {e}")
+                replica.mark_down()
+        return False, None
+
+    async def _route(self, is_read: bool, sticky_key: Optional[str],
+                     run: Callable[[DatabaseConnection], Awaitable[Any]], primary_on_miss: bool = False):
+        if is_read:
+            if self.replicas and not self._must_read_primary(sticky_key):
+                served, result = await self._read_from_replicas(run)
+                if served and (result or not primary_on_miss):
+                    return result
+                if served:
+                    # The row may be newer than the replica, e.g. written by another process
+                    self.replica_misses += 1
+                else:
+                    self.replica_fallbacks += 1
+            self.primary_reads += 1
+            async with self.connection() as conn:
+                return await run(conn)
+
+        async with self.connection() as conn:
+            result = await run(conn)
+        self._record_write(sticky_key)
+        return result
+
+    async def execute_query(self, query: str, params=None, sticky_key: Optional[str] = None):
+        """Run one statement, routing plain SELECTs to a replica when that is safe.
+
+        ``sticky_key`` (e.g. a wallet address) keeps that caller's reads on the
+        primary for a short window after it writes, so read-after-write holds
+        across requests as well as within the current one.
+        """
+        return await self._route(
+            is_read_query(query), sticky_key, lambda conn: conn.execute(query, params)
+        )
+
+    async def execute_values(self, query: str, rows: List[tuple], template: Optional[str] = None):
+        """Multi-row write on the primary, e.g. ``INSERT ... VALUES %s`` for a batch."""
+        if not rows:
+            return 0
+        async with self.connection() as conn:
+            return await conn.execute_values(query, rows, template)
+
+    def prepare(self, name: str, sql: str) -> PreparedStatement:
+        """Register a named statement; it is prepared lazily on each connection."""
+        return self.statements.register(name, sql)
+
+    async def execute_prepared(self, statement: PreparedStatement, params=None,
+                               sticky_key: Optional[str] = None, primary_on_miss: bool = False):
+        """Like ``execute_query`` but reuses the server-side plan for ``statement``.
+
+        Returns rows when the statement produces them, otherwise the row count.
+        With ``primary_on_miss`` an empty result from a replica is re-read on
+        the primary, for lookups whose row may have just been created.
+        """
+        return await self._route(
+            statement.is_read, sticky_key, lambda conn: conn.execute_prepared(statement, params), primary_on_miss
+        )
+
+    async def close_connection(self):
+        await self.pool.close()
+        for replica in self.replicas:
+            await replica.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool": self.pool.stats(),
+            "replicas": [
+                {**replica.pool.stats(), "healthy": replica.healthy, "failures": replica.failures}
+                for replica in self.replicas
+            ],
+            "reads": {
+                "primary": self.primary_reads,
+                "replica": self.replica_reads,
+                "replica_fallbacks": self.replica_fallbacks,
+                "replica_misses": self.replica_misses,
+            },
+            "prepared_statements": self.statements.stats(),
+        }
 
 
-supabase_client = SupabaseClient()
\ No newline at end of file
+supabase_client = SupabaseClient()
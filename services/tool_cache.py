@@ -0,0 +1,116 @@
+import functools
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.cache import TTLCache
+
+
+# Cached tool results kept per loaded server, across all of its cacheable tools
+MCP_TOOL_CACHE_MAX_ENTRIES = int(os.getenv("MCP_TOOL_CACHE_MAX_ENTRIES", "1024"))
+# TTL used by a bare @cacheable without arguments
+MCP_TOOL_CACHE_DEFAULT_TTL = float(os.getenv("MCP_TOOL_CACHE_DEFAULT_TTL", "60"))
+
+CACHE_TTL_ATTRIBUTE = "__mcp_cache_ttl__"
+
+
+def cacheable(ttl: Any = None):
+    """Mark a tool function as a pure function of its arguments.
+
+    Made available to server source as ``cacheable``, in either order with
+    the tool decorator::
+
+        @mcp.tool()
+        @cacheable(ttl=300)
+        def add(a: int, b: int) -> int:
+            return a + b
+
+    Bare ``@cacheable`` uses MCP_TOOL_CACHE_DEFAULT_TTL. The function itself
+    is returned unchanged; the manager wraps marked tools once the server is
+    loaded.
+    """
+    def mark(fn: Callable, seconds: float) -> Callable:
+        if seconds <= 0:
+            raise ValueError("cacheable ttl must be positive")
+        setattr(fn, CACHE_TTL_ATTRIBUTE, float(seconds))
+        return fn
+
+    if callable(ttl):
+        return mark(ttl, MCP_TOOL_CACHE_DEFAULT_TTL)
+    return lambda fn: mark(fn, MCP_TOOL_CACHE_DEFAULT_TTL if ttl is None else ttl)
+
+
+def _json_default(value: Any) -> Any:
+    # Validated arguments may contain pydantic models; anything else is not keyable
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ToolResultCache:
+    """Results of one loaded server's cacheable tools, keyed by canonical arguments.
+
+    Lives on the LoadedServer, so a new code version starts with an empty
+    cache. Keys are the tool name and the validated arguments as sorted,
+    compact JSON; calls whose arguments cannot be serialized, and calls that
+    raise, are never cached.
+    """
+
+    def __init__(self, maxsize: int = MCP_TOOL_CACHE_MAX_ENTRIES):
+        self._results = TTLCache(max(maxsize, 1), MCP_TOOL_CACHE_DEFAULT_TTL)
+        self.tools: List[str] = []
+        self.uncacheable = 0
+
+    def install(self, mcp_server) -> int:
+        """Wrap every tool of ``mcp_server`` marked with @cacheable; returns how many."""
+        for tool in mcp_server._tool_manager.list_tools():
+            ttl = getattr(tool.fn, CACHE_TTL_ATTRIBUTE, None)
+            if ttl is None:
+                continue
+            tool.fn = self._wrap(tool.name, tool.fn, ttl, tool.is_async, tool.context_kwarg)
+            self.tools.append(tool.name)
+        return len(self.tools)
+
+    def _key(self, tool_name: str, kwargs: Dict[str, Any], context_kwarg: Optional[str]):
+        if context_kwarg is not None:
+            kwargs = {name: value for name, value in kwargs.items() if name != context_kwarg}
+        try:
+            return tool_name, json.dumps(kwargs, sort_keys=True, separators=(",", ":"), default=_json_default)
+        except (TypeError, ValueError):
+            self.uncacheable += 1
+            return None
+
+    def _wrap(self, tool_name: str, fn: Callable, ttl: float, is_async: bool, context_kwarg: Optional[str]) -> Callable:
+        # FastMCP decides whether to await from Tool.is_async, so the wrapper keeps fn's kind
+        missing = object()
+
+        if is_async:
+            @functools.wraps(fn)
+            async def cached(**kwargs):
+                key = self._key(tool_name, kwargs, context_kwarg)
+                if key is None:
+                    return await fn(**kwargs)
+                result = self._results.get(key, missing)
+                if result is missing:
+                    result = await fn(**kwargs)
+                    self._results.set(key, result, ttl)
+                return result
+        else:
+            @functools.wraps(fn)
+            def cached(**kwargs):
+                key = self._key(tool_name, kwargs, context_kwarg)
+                if key is None:
+                    return fn(**kwargs)
+                result = self._results.get(key, missing)
+                if result is missing:
+                    result = fn(**kwargs)
+                    self._results.set(key, result, ttl)
+                return result
+
+        return cached
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tools": list(self.tools), "uncacheable": self.uncacheable, **self._results.stats()}
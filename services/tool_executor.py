@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from services.mcp_metrics import Histogram
+
+
+# Threads per server for synchronous tools, unless the server's package_json sets its own
+MCP_TOOL_EXECUTOR_WORKERS = int(os.getenv("MCP_TOOL_EXECUTOR_WORKERS", "4"))
+# Ceiling for a server's own max_workers setting
+MCP_TOOL_EXECUTOR_MAX_WORKERS = int(os.getenv("MCP_TOOL_EXECUTOR_MAX_WORKERS", "16"))
+# Per-call limit for synchronous tools, including the wait for a thread
+MCP_TOOL_TIMEOUT_SECONDS = float(os.getenv("MCP_TOOL_TIMEOUT_SECONDS", "30"))
+# Ceiling for a server's own timeout_seconds setting
+MCP_TOOL_MAX_TIMEOUT_SECONDS = float(os.getenv("MCP_TOOL_MAX_TIMEOUT_SECONDS", "120"))
+
+
+class ToolTimeout(TimeoutError):
+    """A synchronous tool did not finish within its server's timeout."""
+
+
+def executor_settings(config: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Thread count and timeout from a server's ``package_json.tool_executor``, within the platform ceilings."""
+    config = config if isinstance(config, dict) else {}
+    try:
+        max_workers = int(config.get("max_workers", MCP_TOOL_EXECUTOR_WORKERS))
+    except (TypeError, ValueError):
+        max_workers = MCP_TOOL_EXECUTOR_WORKERS
+    try:
+        timeout = float(config.get("timeout_seconds", MCP_TOOL_TIMEOUT_SECONDS))
+    except (TypeError, ValueError):
+        timeout = MCP_TOOL_TIMEOUT_SECONDS
+    if timeout <= 0 or timeout > MCP_TOOL_MAX_TIMEOUT_SECONDS:
+        timeout = MCP_TOOL_MAX_TIMEOUT_SECONDS
+    return {
+        "max_workers": min(max(max_workers, 1), MCP_TOOL_EXECUTOR_MAX_WORKERS),
+        "timeout_seconds": timeout
+    }
+
+
+class ToolExecutor:
+    """Runs one loaded server's synchronous tools on its own bounded thread pool.
+
+    ``install`` swaps each ``def`` tool for a coroutine that submits the call
+    and awaits it, so blocking tool code never runs on the event loop. Threads
+    are started on demand up to ``max_workers``; calls beyond that queue.
+
+    A call that times out or is cancelled while still queued never runs. A
+    thread cannot be interrupted, so one that is already running finishes in
+    the background and is counted as abandoned. Time spent queued and time
+    spent running are recorded separately, for sizing the pool.
+    """
+
+    def __init__(self, slug: str, max_workers: int = MCP_TOOL_EXECUTOR_WORKERS, timeout: float = MCP_TOOL_TIMEOUT_SECONDS):
+        self.slug = slug
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.tools: List[str] = []
+        self.queued = 0
+        self.running = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.abandoned = 0
+        self.wait = Histogram()
+        self.execution = Histogram()
+
+    @classmethod
+    def for_server(cls, slug: str, config: Optional[Dict[str, Any]]) -> "ToolExecutor":
+        settings = executor_settings(config)
+        return cls(slug, settings["max_workers"], settings["timeout_seconds"])
+
+    def install(self, mcp_server) -> int:
+        """Move every synchronous tool of ``mcp_server`` onto the pool; returns how many."""
+        for tool in mcp_server._tool_manager.list_tools():
+            if tool.is_async:
+                continue
+            # FastMCP awaits the tool from here on
+            tool.fn = self._wrap(tool.name, tool.fn)
+            tool.is_async = True
+            self.tools.append(tool.name)
+        return len(self.tools)
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix=f"mcp-tool:{self.slug}")
+        return self._pool
+
+    def _wrap(self, tool_name: str, fn: Callable) -> Callable:
+
+        @functools.wraps(fn)
+        async def offloaded(**kwargs):
+            loop = asyncio.get_running_loop()
+            submitted = time.perf_counter()
+
+            def run():
+                started = time.perf_counter()
+                loop.call_soon_threadsafe(self._started, started - submitted)
+                try:
+                    return fn(**kwargs)
+                finally:
+                    loop.call_soon_threadsafe(self._finished, time.perf_counter() - started)
+
+            # Threads do not inherit contextvars; the tool sees the request context as it would inline
+            context = contextvars.copy_context()
+            call = self._ensure_pool().submit(context.run, run)
+            self.queued += 1
+            # Only a call that never reached a thread ends up cancelled
+            call.add_done_callback(lambda call: call.cancelled() and loop.call_soon_threadsafe(self._dropped))
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(call, loop=loop), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._gave_up(call)
+                raise ToolTimeout(f"Tool {tool_name} timed out after {self.timeout}s") from None
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                self._gave_up(call)
+                raise
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.calls += 1
+
+        return offloaded
+
+    def _gave_up(self, call):
+        # Cancelling stops a queued call; one already on a thread runs to completion unobserved
+        if not call.cancelled():
+            self.abandoned += 1
+
+    def _dropped(self):
+        self.queued -= 1
+
+    def _started(self, wait_seconds: float):
+        self.queued -= 1
+        self.running += 1
+        self.wait.observe(wait_seconds * 1000)
+
+    def _finished(self, execution_seconds: float):
+        self.running -= 1
+        self.execution.observe(execution_seconds * 1000)
+
+    def shutdown(self):
+        """Drop queued calls and release the threads once running calls finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tools": list(self.tools),
+            "max_workers": self.max_workers,
+            "timeout_seconds": self.timeout,
+            "queued": self.queued,
+            "running": self.running,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "abandoned": self.abandoned,
+            "wait_ms": _latency(self.wait),
+            "execution_ms": _latency(self.execution)
+        }
+
+
+def _latency(histogram: Histogram) -> Dict[str, Any]:
+    return {key: value for key, value in histogram.to_dict().items() if key not in ("errors", "tool_errors")}
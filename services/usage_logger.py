@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.supabase_client import supabase_client
+
+
+# Records waiting to be written; new ones are dropped (and counted) past this
+USAGE_LOG_QUEUE_SIZE = int(os.getenv("USAGE_LOG_QUEUE_SIZE", "10000"))
+USAGE_LOG_BATCH_SIZE = int(os.getenv("USAGE_LOG_BATCH_SIZE", "500"))
+USAGE_LOG_FLUSH_INTERVAL = float(os.getenv("USAGE_LOG_FLUSH_INTERVAL", "2"))
+
+INSERT_USAGE_LOGS = """
+    INSERT INTO server_usage_logs (
+        server_id, tool_name, client_identifier, request_data, response_status,
+        response_time_ms, error_message, ip_address, user_agent, created_at
+    ) VALUES %s
+"""
+INSERT_USAGE_LOGS_TEMPLATE = "(%s::uuid, %s, %s, %s::jsonb, %s, %s, %s, %s::inet, %s, %s)"
+
+# One statement per flush for every server that saw traffic; the servers trigger
+# leaves updated_at alone for these counter-only updates
+UPDATE_SERVER_COUNTERS = """
+    UPDATE servers AS s
+    SET total_requests = COALESCE(s.total_requests, 0) + v.requests,
+        last_accessed_at = GREATEST(s.last_accessed_at, v.last_accessed_at)
+    FROM (VALUES %s) AS v(id, requests, last_accessed_at)
+    WHERE s.id = v.id
+"""
+UPDATE_SERVER_COUNTERS_TEMPLATE = "(%s::uuid, %s::integer, %s::timestamptz)"
+
+
+class UsageLogger:
+    """Write-behind pipeline for server_usage_logs and the servers request counters.
+
+    ``record`` never waits on the database: rows go onto a bounded queue that a
+    background task drains in multi-row INSERTs every ``flush_interval`` (or as
+    soon as a full batch is waiting). Request counts and last access times are
+    summed per server in memory and applied as one UPDATE per flush, and they
+    stay exact even when log rows are dropped.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = USAGE_LOG_QUEUE_SIZE,
+        batch_size: int = USAGE_LOG_BATCH_SIZE,
+        flush_interval: float = USAGE_LOG_FLUSH_INTERVAL
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: List[Tuple] = []
+        # server_id -> [requests, last_accessed_at]
+        self._counters: Dict[str, List[Any]] = {}
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms: Optional[float] = None
+
+    def _ensure_flusher(self):
+        if self._stopping:
+            return
+        if self._flusher is None or self._flusher.done():
+            self._batch_ready = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_forever())
+
+    async def _flush_forever(self):
+        while not self._stopping:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            self._batch_ready.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Usage log flush failed: {e}")
+
+    def record(
+        self,
+        server_id: Any,
+        tool_name: Optional[str] = None,
+        request_data: Optional[Dict[str, Any]] = None,
+        status: Optional[int] = None,
+        latency_ms: Optional[float] = None,
+        client_identifier: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        error_message: Optional[str] = None
+    ):
+        """Queue one usage row and count the request; never blocks."""
+        if server_id is None:
+            return
+        self._ensure_flusher()
+        now = datetime.now(timezone.utc)
+        server_id = str(server_id)
+        self.recorded += 1
+
+        counter = self._counters.get(server_id)
+        if counter is None:
+            self._counters[server_id] = [1, now]
+        else:
+            counter[0] += 1
+            counter[1] = now
+
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append((
+            server_id,
+            tool_name[:255] if tool_name else None,
+            client_identifier[:255] if client_identifier else None,
+            json.dumps(request_data) if request_data else None,
+            status,
+            int(latency_ms) if latency_ms is not None else None,
+            error_message,
+            ip_address,
+            user_agent,
+            now
+        ))
+        if len(self._queue) >= self.batch_size and self._batch_ready is not None:
+            self._batch_ready.set()
+
+    async def flush(self):
+        """Write everything queued so far, then the aggregated counters."""
+        if self._flush_lock is None or not (self._queue or self._counters):
+            return
+        async with self._flush_lock:
+            started = time.perf_counter()
+            while self._queue:
+                batch = self._queue[:self.batch_size]
+                del self._queue[:self.batch_size]
+                try:
+                    await supabase_client.execute_values(INSERT_USAGE_LOGS, batch, INSERT_USAGE_LOGS_TEMPLATE)
+                    self.written += len(batch)
+                except Exception as e:
+                    # Usage rows are best effort; the counters below still apply
+                    self.failed += len(batch)
+                    print(f"Failed to write {len(batch)} usage log rows: {e}")
+
+            counters, self._counters = self._counters, {}
+            if counters:
+                rows = [(server_id, requests, last_accessed) for server_id, (requests, last_accessed) in counters.items()]
+                try:
+                    await supabase_client.execute_values(UPDATE_SERVER_COUNTERS, rows, UPDATE_SERVER_COUNTERS_TEMPLATE)
+                except Exception:
+                    # Fold back in so the next flush retries them
+                    for server_id, (requests, last_accessed) in counters.items():
+                        counter = self._counters.setdefault(server_id, [0, last_accessed])
+                        counter[0] += requests
+                        counter[1] = max(counter[1], last_accessed)
+                    raise
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def shutdown(self):
+        """Stop the background flusher and write whatever is still queued."""
+        self._stopping = True
+        if self._flusher is not None:
+            # Let a flush in progress finish rather than cancelling it mid-batch
+            self._batch_ready.set()
+            await self._flusher
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Final usage log flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "pending_counters": len(self._counters),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms
+        }
+
+
+# Global instance
+usage_logger = UsageLogger()
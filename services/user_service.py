@@ -1,22 +1,87 @@
+import os
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 from models.user import User
 from services.supabase_client import supabase_client
 from services.crypto_service import crypto_service
+from services.auth_service import NONCE_EXPIRATION_MINUTES
+from utils.cache import TTLCache
+
+
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+# Normalized wallet address -> User. Per process, so the TTL bounds how long a
+# write made by another worker can go unseen.
+user_cache = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+
+USER_BY_WALLET = supabase_client.prepare(
+    "user_by_wallet",
+    "SELECT * FROM users WHERE wallet_address = %s"
+)
+UPDATE_USER_NONCE = supabase_client.prepare(
+    "update_user_nonce",
+    "UPDATE users SET nonce = %s, updated_at = %s WHERE wallet_address = %s"
+)
+# Expiry is computed on the database clock so verification can compare against NOW()
+UPSERT_USER_NONCE = supabase_client.prepare("upsert_user_nonce", """
+    INSERT INTO users (wallet_address, display_name, nonce, nonce_expires_at,
+                       created_at, updated_at, is_active, subscription_tier)
+    VALUES (%s, %s, %s, NOW() + make_interval(mins => %s), NOW(), NOW(), TRUE, 'free')
+    ON CONFLICT (wallet_address) DO UPDATE
+    SET nonce = EXCLUDED.nonce,
+        nonce_expires_at = EXCLUDED.nonce_expires_at,
+        updated_at = EXCLUDED.updated_at
+    RETURNING wallet_address, nonce, nonce_expires_at
+""")
+# Clears the nonce only if it matches and is unexpired; NULL expiry never matches
+CONSUME_USER_NONCE = supabase_client.prepare("consume_user_nonce", """
+    UPDATE users
+    SET nonce = NULL, nonce_expires_at = NULL, updated_at = NOW()
+    WHERE wallet_address = %s AND nonce = %s AND nonce_expires_at > NOW()
+    RETURNING wallet_address, display_name, subscription_tier, is_active
+""")
+# Insert-if-missing without rewriting existing rows; the CTE's insert is not
+# visible to the outer SELECT, hence the UNION
+ENSURE_USER = supabase_client.prepare("ensure_user", """
+    WITH inserted AS (
+        INSERT INTO users (wallet_address, display_name, created_at, updated_at,
+                           is_active, subscription_tier)
+        VALUES (%s, %s, NOW(), NOW(), TRUE, 'free')
+        ON CONFLICT (wallet_address) DO NOTHING
+        RETURNING wallet_address, display_name, subscription_tier, is_active
+    )
+    SELECT * FROM inserted
+    UNION ALL
+    SELECT wallet_address, display_name, subscription_tier, is_active
+    FROM users WHERE wallet_address = %s
+    LIMIT 1
+""")
 
 
 class UserService:
     @staticmethod
     async def get_user_by_wallet(wallet_address: str) -> Optional[User]:
-        """Get user by wallet address (primary key)."""
+        """Get user by wallet address (primary key), served from the user cache when fresh."""
         try:
             normalized_address = crypto_service.normalize_wallet_address(wallet_address)
-            query = "SELECT * FROM users WHERE wallet_address = %s"
-            result = supabase_client.execute_query(query, (normalized_address,))
+            cached_user = user_cache.get(normalized_address)
+            if cached_user is not None:
+                return cached_user
+            
+            # An invalidation of this wallet while the query is in flight may make its result stale
+            generation = user_cache.key_generation(normalized_address)
+            result = await supabase_client.execute_prepared(
+                USER_BY_WALLET, (normalized_address,), sticky_key=normalized_address
+            )
             
             if result:
                 user_data = dict(result[0])
-                return User(**user_data)
+                user = User(**user_data)
+                if user_cache.key_generation(normalized_address) == generation:
+                    user_cache.set(normalized_address, user)
+                return user
             return None
             
         except Exception as e:
@@ -36,10 +101,11 @@ class UserService:
                                  created_at, updated_at, is_active, subscription_tier)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
             """
-            supabase_client.execute_query(query, (
+            await supabase_client.execute_query(query, (
                 normalized_address, display_name, nonce,
                 current_time, current_time, True, "free"
-            ))
+            ), sticky_key=normalized_address)
+            user_cache.invalidate(normalized_address)
             
             return User(
                 wallet_address=normalized_address,
@@ -62,15 +128,11 @@ class UserService:
             normalized_address = crypto_service.normalize_wallet_address(wallet_address)
             current_time = datetime.utcnow()
             
-            query = """
-                UPDATE users 
-                SET nonce = %s, updated_at = %s 
-                WHERE wallet_address = %s
-            """
-            result = supabase_client.execute_query(query, (
+            result = await supabase_client.execute_prepared(UPDATE_USER_NONCE, (
                 nonce, current_time, normalized_address
-            ))
+            ), sticky_key=normalized_address)
             
+            user_cache.invalidate(normalized_address)
             return result > 0
             
         except Exception as e:
@@ -89,8 +151,11 @@ class UserService:
                 SET nonce = NULL, updated_at = %s 
                 WHERE wallet_address = %s
             """
-            result = supabase_client.execute_query(query, (current_time, normalized_address))
+            result = await supabase_client.execute_query(
+                query, (current_time, normalized_address), sticky_key=normalized_address
+            )
             
+            user_cache.invalidate(normalized_address)
             return result > 0
             
         except Exception as e:
@@ -98,18 +163,53 @@ class UserService:
             return False
 
     @staticmethod
-    async def create_or_update_user_with_nonce(wallet_address: str, nonce: str) -> User:
-        """Create user if doesn't exist, or update existing user with new nonce."""
-        user = await UserService.get_user_by_wallet(wallet_address)
+    async def upsert_user_nonce(wallet_address: str, nonce: str) -> Dict[str, Any]:
+        """Create the user if needed and park a fresh nonce, in one atomic statement.
+        
+        Returns only wallet_address, nonce and nonce_expires_at.
+        """
+        normalized_address = crypto_service.normalize_wallet_address(wallet_address)
+        display_name = f"User_{normalized_address[:8]}"
         
-        if user:
-            # Update existing user with new nonce
-            await UserService.update_user_nonce(wallet_address, nonce)
-            user.nonce = nonce
-            return user
-        else:
-            # Create new user
-            return await UserService.create_user(wallet_address, nonce)
+        result = await supabase_client.execute_prepared(UPSERT_USER_NONCE, (
+            normalized_address, display_name, nonce, NONCE_EXPIRATION_MINUTES
+        ), sticky_key=normalized_address)
+        
+        user_cache.invalidate(normalized_address)
+        return dict(result[0])
+
+    @staticmethod
+    async def consume_user_nonce(wallet_address: str, nonce: str) -> Optional[Dict[str, Any]]:
+        """Atomically clear the user's nonce if it matches and has not expired.
+        
+        Returns the fields needed for the JWT (wallet_address, display_name,
+        subscription_tier, is_active), or None when the nonce is wrong, expired
+        or already used.
+        """
+        normalized_address = crypto_service.normalize_wallet_address(wallet_address)
+        result = await supabase_client.execute_prepared(
+            CONSUME_USER_NONCE, (normalized_address, nonce), sticky_key=normalized_address
+        )
+        
+        user_cache.invalidate(normalized_address)
+        return dict(result[0]) if result else None
+
+    @staticmethod
+    async def ensure_user(wallet_address: str) -> Dict[str, Any]:
+        """Return the fields needed for the JWT, creating the user if it does not exist."""
+        normalized_address = crypto_service.normalize_wallet_address(wallet_address)
+        display_name = f"User_{normalized_address[:8]}"
+        
+        result = await supabase_client.execute_prepared(ENSURE_USER, (
+            normalized_address, display_name, normalized_address
+        ), sticky_key=normalized_address)
+        
+        return dict(result[0])
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the get_user_by_wallet cache."""
+        return user_cache.stats()
 
     @staticmethod
     async def update_user_profile(wallet_address: str, **kwargs) -> bool:
@@ -127,8 +227,9 @@ class UserService:
             query = f"UPDATE users SET {set_clause} WHERE wallet_address = %s"
             
             values = list(updates.values()) + [normalized_address]
-            result = supabase_client.execute_query(query, values)
+            result = await supabase_client.execute_query(query, values, sticky_key=normalized_address)
             
+            user_cache.invalidate(normalized_address)
             return result > 0
             
         except Exception as e:
@@ -0,0 +1,107 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+# Error responses are short; larger JSON-RPC messages are results and are not parsed
+MAX_SCANNED_MESSAGE = 4096
+
+_METHOD = re.compile(rb'"method"\s*:\s*"([^"\\]+)"')
+_NAME = re.compile(rb'"name"\s*:\s*"([^"\\]+)"')
+# One C scan per chunk; only chunks that match pay for a parse
+_FAILURE_MARKER = re.compile(rb'"error"|"isError":\s*true')
+
+
+def _may_report_failure(data: bytes) -> bool:
+    return _FAILURE_MARKER.search(data) is not None
+
+
+class ExchangeTap:
+    """Wraps an ASGI receive/send pair to observe one HTTP exchange unchanged.
+
+    The per-message path only keeps the first request body chunk and the
+    response status, and runs one precompiled marker search over each
+    response body chunk. Only a chunk that may carry a JSON-RPC error or a
+    failed tool call is parsed, as a JSON body or as SSE ``data:`` lines. The
+    MCP transport sends each JSON body and each SSE event in one chunk, so a
+    message split across chunks is not scanned. Method and tool names are
+    extracted by ``jsonrpc_calls`` once the response has been sent.
+    """
+
+    __slots__ = ("_receive", "_send", "first_chunk", "body_truncated", "status", "rpc_errors", "tool_errors")
+
+    def __init__(self, receive, send):
+        self._receive = receive
+        self._send = send
+        self.first_chunk: Optional[bytes] = None
+        # The request body did not fit in its first chunk
+        self.body_truncated = False
+        self.status: Optional[int] = None
+        self.rpc_errors = 0
+        self.tool_errors = 0
+
+    async def receive(self):
+        message = await self._receive()
+        if self.first_chunk is None and message["type"] == "http.request":
+            self.first_chunk = message.get("body", b"")
+            self.body_truncated = message.get("more_body", False)
+        return message
+
+    async def send(self, message):
+        body = message.get("body")
+        if body is not None:
+            if _FAILURE_MARKER.search(body) is not None:
+                self._inspect_chunk(body)
+        elif message["type"] == "http.response.start":
+            self.status = message["status"]
+        await self._send(message)
+
+    def _inspect_chunk(self, chunk: bytes):
+        if chunk[:1] in (b"{", b"["):
+            if len(chunk) <= MAX_SCANNED_MESSAGE:
+                self._inspect(chunk)
+            return
+        for line in chunk.splitlines():
+            if line.startswith(b"data:") and len(line) <= MAX_SCANNED_MESSAGE and _may_report_failure(line):
+                self._inspect(line[5:])
+
+    def _inspect(self, data: bytes):
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return
+        for message in payload if isinstance(payload, list) else [payload]:
+            if not isinstance(message, dict):
+                continue
+            if "error" in message:
+                self.rpc_errors += 1
+            elif isinstance(message.get("result"), dict) and message["result"].get("isError"):
+                self.tool_errors += 1
+
+    def jsonrpc_calls(self) -> List[Dict[str, Any]]:
+        """``{"method", "tool"}`` for each JSON-RPC message in the first request body chunk."""
+        body = self.first_chunk
+        if not body:
+            return []
+        if body.count(b'"method"') == 1 and body.count(b'"name"') <= 1:
+            # One message and no ambiguous "name" keys: regexes are exact and far cheaper than a parse
+            method = _METHOD.search(body)
+            if method is not None:
+                method = method.group(1).decode()
+                name = _NAME.search(body) if method == "tools/call" else None
+                return [{"method": method, "tool": name.group(1).decode() if name else None}]
+        if self.body_truncated:
+            return []
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return []
+        messages = payload if isinstance(payload, list) else [payload]
+        calls = []
+        for message in messages:
+            if not isinstance(message, dict) or "method" not in message:
+                continue
+            params = message.get("params")
+            tool = params.get("name") if message["method"] == "tools/call" and isinstance(params, dict) else None
+            calls.append({"method": message["method"], "tool": tool})
+        return calls
@@ -0,0 +1,82 @@
+import functools
+import os
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import JSONResponse
+from services.auth_service import auth_service
+
+
+# Comma-separated wallet addresses allowed to call /admin endpoints
+ADMIN_WALLETS = {
+    wallet.strip().lower() for wallet in os.getenv("ADMIN_WALLETS", "").split(",") if wallet.strip()
+}
+
+
+class WalletUser(BaseUser):
+    """Principal decoded from a verified JWT."""
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.wallet_address = payload["sub"]
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def display_name(self) -> str:
+        return self.payload.get("display_name") or self.wallet_address
+
+    @property
+    def identity(self) -> str:
+        return self.wallet_address
+
+
+class JWTAuthBackend(AuthenticationBackend):
+    """Decodes the Bearer token once per request for Starlette's AuthenticationMiddleware.
+
+    Requests without a valid token pass through unauthenticated; handlers that
+    need a user opt in with ``login_required``. The decoded payload is also
+    kept in ``request.state.principal``.
+    """
+
+    async def authenticate(self, conn: HTTPConnection):
+        auth_header = conn.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return None
+
+        payload = auth_service.verify_token(auth_header[len("Bearer "):])
+        if not payload or not payload.get("sub"):
+            return None
+
+        conn.state.principal = payload
+        return AuthCredentials(["authenticated"]), WalletUser(payload)
+
+
+def login_required(handler):
+    """Reject unauthenticated requests to an endpoint with a 401 JSON error."""
+
+    @functools.wraps(handler)
+    async def wrapper(request: Request):
+        if not request.user.is_authenticated:
+            if not request.headers.get("Authorization", "").startswith("Bearer "):
+                error = "Missing or invalid authorization header"
+            else:
+                error = "Invalid or expired token"
+            return JSONResponse({"success": False, "error": error}, status_code=401)
+        return await handler(request)
+
+    return wrapper
+
+
+def admin_required(handler):
+    """Like ``login_required``, and also reject wallets not listed in ADMIN_WALLETS with a 403."""
+
+    @login_required
+    @functools.wraps(handler)
+    async def wrapper(request: Request):
+        if request.user.wallet_address.lower() not in ADMIN_WALLETS:
+            return JSONResponse({"success": False, "error": "Admin access required"}, status_code=403)
+        return await handler(request)
+
+    return wrapper
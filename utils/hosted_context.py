@@ -0,0 +1,52 @@
+import asyncio
+from typing import AsyncContextManager, Callable, Optional
+
+
+class HostedContext:
+    """Keeps an async context manager open inside a dedicated long-lived task.
+
+    Context managers built on anyio task groups (e.g. FastMCP session managers
+    or Starlette lifespans) must be exited by the task that entered them. A
+    request task cannot hold them open past its own lifetime, so this runs the
+    ``async with`` in a background task and tears it down from the same task.
+    """
+
+    def __init__(self, factory: Callable[[], AsyncContextManager], name: Optional[str] = None):
+        self.factory = factory
+        self.name = name
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Future] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    async def _host(self):
+        try:
+            async with self.factory():
+                self._ready.set_result(None)
+                await self._stop.wait()
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+                return
+            raise
+
+    async def start(self):
+        """Enter the context; raises whatever entering it raised."""
+        loop = asyncio.get_running_loop()
+        self._ready = loop.create_future()
+        self._stop = asyncio.Event()
+        self._task = loop.create_task(self._host(), name=self.name)
+        await self._ready
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def stop(self):
+        """Exit the context from its hosting task and wait for it to finish."""
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
@@ -0,0 +1,92 @@
+import asyncio
+import importlib
+import time
+from typing import Any, Dict, List, Optional
+from utils.hosted_context import HostedContext
+
+
+class LazyRouter:
+    """ASGI app that imports ``"package.module:attribute"`` on its first request.
+
+    Keeps a router's heavy dependencies (FastMCP, eth_account, requests, ...)
+    off the worker boot path. When ``lifespan`` names a module-level lifespan
+    factory, it is entered once the module loads and exited at app shutdown.
+    """
+
+    def __init__(self, registry: "LazyRouterRegistry", target: str, lifespan: Optional[str] = None):
+        self.registry = registry
+        self.module_name, self.attribute = target.split(":")
+        self.lifespan = lifespan
+        self.load_seconds: Optional[float] = None
+        self._app = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._app is not None
+
+    @property
+    def routes(self) -> List[Any]:
+        return getattr(self._app, "routes", [])
+
+    async def load(self):
+        if self._app is not None:
+            return self._app
+        async with self._lock:
+            if self._app is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self.module_name)
+                if self.lifespan:
+                    await self.registry.enter_lifespan(getattr(module, self.lifespan), self.module_name)
+                self._app = getattr(module, self.attribute)
+                self.load_seconds = time.perf_counter() - started
+        return self._app
+
+    async def __call__(self, scope, receive, send):
+        app = self._app or await self.load()
+        await app(scope, receive, send)
+
+
+class LazyRouterRegistry:
+    """Tracks lazily mounted routers and the module lifespans they started."""
+
+    def __init__(self):
+        self.routers: List[LazyRouter] = []
+        self.app = None
+        self._lifespans: List[HostedContext] = []
+
+    def mount(self, target: str, lifespan: Optional[str] = None) -> LazyRouter:
+        router = LazyRouter(self, target, lifespan=lifespan)
+        self.routers.append(router)
+        return router
+
+    def bind(self, app):
+        """Remember the application passed to module lifespans."""
+        self.app = app
+
+    async def enter_lifespan(self, lifespan_factory, name: str):
+        hosted = HostedContext(lambda: lifespan_factory(self.app), name=f"lifespan:{name}")
+        await hosted.start()
+        self._lifespans.append(hosted)
+
+    async def prewarm(self):
+        """Load every router up front, e.g. before the worker reports ready."""
+        for router in self.routers:
+            await router.load()
+
+    async def shutdown(self):
+        while self._lifespans:
+            hosted = self._lifespans.pop()
+            try:
+                await hosted.stop()
+            except Exception as e:
+                print(f"Error shutting down {hosted.name}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            router.module_name: {
+                "loaded": router.loaded,
+                "load_ms": round(router.load_seconds * 1000, 2) if router.load_seconds is not None else None,
+            }
+            for router in self.routers
+        }
@@ -0,0 +1,78 @@
+import contextlib
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+import types
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+# Shared by every server; following them would count the interpreter, not the tenant
+_SHARED_TYPES = (type, types.ModuleType, types.BuiltinFunctionType, types.CodeType)
+
+
+@contextlib.contextmanager
+def traced_allocations() -> Iterator[Dict[str, int]]:
+    """Measure what the block allocates with tracemalloc.
+
+    Yields a dict that holds ``bytes`` (still allocated when the block ends)
+    and ``peak_bytes`` once it exits. Tracing is only switched on for the
+    block unless something else already started it. Other threads allocate
+    into the same counters, so run only synchronous work inside.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result: Dict[str, int] = {}
+    try:
+        yield result
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        result["bytes"] = max(current - before, 0)
+        result["peak_bytes"] = max(peak - before, 0)
+        if started:
+            tracemalloc.stop()
+
+
+def deep_sizeof(roots: Iterable[Any], namespace: Optional[dict] = None, max_objects: int = 1_000_000) -> Dict[str, Any]:
+    """Approximate bytes reachable from ``roots`` that belong to them alone.
+
+    Classes, modules, builtins and code objects are shared and not followed.
+    Functions are only followed when defined in ``namespace`` (their own
+    globals), so a reference to library code does not pull in the library.
+    Stops after ``max_objects`` and reports ``truncated``.
+    """
+    seen = set()
+    stack = list(roots)
+    total = 0
+    count = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, types.FunctionType):
+            if obj.__globals__ is not namespace:
+                continue
+            referents = [obj.__defaults__, obj.__kwdefaults__, obj.__closure__, obj.__dict__]
+        else:
+            referents = gc.get_referents(obj)
+        total += sys.getsizeof(obj, 0)
+        count += 1
+        if count >= max_objects:
+            return {"bytes": total, "objects": count, "truncated": True}
+        stack.extend(referent for referent in referents if referent is not None)
+    return {"bytes": total, "objects": count, "truncated": False}
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Current resident set size; the peak where /proc is not available."""
+    with contextlib.suppress(OSError, ValueError, IndexError):
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024